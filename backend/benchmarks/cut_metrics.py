@@ -0,0 +1,39 @@
+from typing import Iterable, List
+
+
+def match_cuts(reference: Iterable[float], candidate: Iterable[float], tolerance: float) -> dict:
+    """
+    按时间容差一对一匹配切点（双指针贪心），返回 precision / recall / 平均偏移。
+    reference 视为真值，candidate 为待评估结果，两者均不含首尾边界。
+    """
+    ref = sorted(reference)
+    cand = sorted(candidate)
+    matched_offsets: List[float] = []
+    i = j = 0
+    while i < len(ref) and j < len(cand):
+        delta = cand[j] - ref[i]
+        if abs(delta) <= tolerance:
+            matched_offsets.append(delta)
+            i += 1
+            j += 1
+        elif delta < 0:
+            j += 1
+        else:
+            i += 1
+
+    matched = len(matched_offsets)
+    precision = matched / len(cand) if cand else (1.0 if not ref else 0.0)
+    recall = matched / len(ref) if ref else 1.0
+    return {
+        "reference": len(ref),
+        "candidate": len(cand),
+        "matched": matched,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "mean_abs_offset": round(sum(abs(d) for d in matched_offsets) / matched, 4) if matched else None,
+    }
+
+
+def inner_cut_times(cuts: List[dict]) -> List[float]:
+    """去掉 detect_scenes 结果中的首尾边界，只保留真正的切点时间。"""
+    return [cut["time"] for cut in cuts if cut.get("type") != "boundary"]
@@ -0,0 +1,116 @@
+"""
+FrameService 编辑版档位基准测试：对每个档位转码同一视频，统计文件大小、转码耗时，
+以及随机时间点取帧（缓存未命中）的 p50 / p99 延迟（JSON）。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.proxy_benchmark [video.mp4 ...] [--tiers scrub,review,full] \
+        [--grabs 100] [--decoder-pool 4] [--workdir DIR] [--output report.json]
+
+未指定视频时使用 scene_benchmark 的合成场景（hd_1080p30）。
+每个档位使用独立的转码目录，取帧延迟只统计未命中磁盘/内存缓存的请求。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.scene_benchmark import SCENARIOS, generate_video
+from services.frame_service import FrameService
+from services.media_probe import media_probe
+
+
+def run_tier(video_path: str, tier: str, args: argparse.Namespace, workdir: str) -> dict:
+    service = FrameService(os.path.join(workdir, f"transcodes_{tier}"))
+    service.decoder_pool.max_size = args.decoder_pool
+    duration = media_probe.get_duration(video_path)
+
+    started = time.perf_counter()
+    session = service.ensure_session(video_path, duration, tier=tier)
+    transcode_seconds = time.perf_counter() - started
+
+    edit_size = os.path.getsize(session["edit_path"])
+    edit_info = media_probe.probe(session["edit_path"])
+
+    # 固定种子，各档位取同一组时间点；每个时间点都是首次请求
+    rng = random.Random(args.seed)
+    timecodes = sorted({round(rng.uniform(0, max(duration - 0.1, 0.0)), 3) for _ in range(args.grabs)})
+    rng.shuffle(timecodes)
+    latencies: List[float] = []
+    for timecode in timecodes:
+        grab_started = time.perf_counter()
+        service.get_frame_bytes(session["session_id"], timecode)
+        latencies.append((time.perf_counter() - grab_started) * 1000)
+    service.shutdown()
+
+    return {
+        "tier": tier,
+        "resolution": f"{edit_info['width']}x{edit_info['height']}",
+        "transcode_seconds": round(transcode_seconds, 3),
+        "realtime_factor": round(duration / transcode_seconds, 2) if transcode_seconds else None,
+        "edit_mb": round(edit_size / 1024 / 1024, 2),
+        "mbit_per_second": round(edit_size * 8 / 1_000_000 / duration, 2) if duration else None,
+        "grabs": len(latencies),
+        "grab_p50_ms": round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+        "grab_p99_ms": round(float(np.percentile(latencies, 99)), 2) if latencies else None,
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    tiers = args.tiers.split(",") if args.tiers else list(FrameService.PROXY_TIERS)
+    unknown = [tier for tier in tiers if tier not in FrameService.PROXY_TIERS]
+    if unknown:
+        raise SystemExit(f"未知的档位: {', '.join(unknown)}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="proxy_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    videos = args.videos or [generate_video("hd_1080p30", SCENARIOS["hd_1080p30"], workdir)["path"]]
+
+    results = []
+    for video_path in videos:
+        info = media_probe.probe(video_path)
+        for tier in tiers:
+            results.append(
+                {
+                    "video": video_path,
+                    "source_resolution": f"{info['width']}x{info['height']}",
+                    "duration": round(info["duration"], 3),
+                    **run_tier(video_path, tier, args, workdir),
+                }
+            )
+
+    return {
+        "workdir": workdir,
+        "decoder_pool": args.decoder_pool,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="FrameService 编辑版档位基准测试")
+    parser.add_argument("videos", nargs="*", help="待测视频，缺省使用合成视频")
+    parser.add_argument("--tiers", help=f"逗号分隔，可选: {', '.join(FrameService.PROXY_TIERS)}")
+    parser.add_argument("--grabs", type=int, default=100, help="每个档位随机取帧次数")
+    parser.add_argument("--decoder-pool", type=int, default=4, help="常驻解码器数量，0 表示每次调用 ffmpeg")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="工作目录，保留转码结果便于查看")
+    parser.add_argument("--output", help="报告输出路径，默认打印到 stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
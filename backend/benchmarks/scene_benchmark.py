@@ -0,0 +1,242 @@
+"""
+SceneDetector 基准测试：用 ffmpeg lavfi 在本地生成带已知切点的合成视频，
+逐个配置/后端运行检测，输出解码帧率、耗时、峰值内存、precision / recall（JSON）。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.scene_benchmark [--scenarios hard_cuts,fades] [--configs single_pass,opencv] \
+        [--workdir DIR] [--tolerance-frames 2] [--output report.json]
+
+每个用例在独立子进程中运行，峰值内存互不干扰；ffmpeg 子进程的峰值内存单独统计。
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List
+
+from benchmarks.cut_metrics import inner_cut_times, match_cuts
+from services.media_probe import media_probe
+from services.scene_detector import SceneDetector
+
+# 片段源：相邻片段内容差异明显，拼接处即为真值切点
+SCENARIOS: Dict[str, dict] = {
+    "hard_cuts": {
+        "size": "640x360",
+        "rate": 25,
+        "segments": [("testsrc", 4), ("mandelbrot", 5), ("color=c=red", 3), ("smptebars", 4), ("testsrc2", 4)],
+    },
+    "fades": {
+        "size": "640x360",
+        "rate": 25,
+        "fade": 1.0,
+        "segments": [("testsrc", 5), ("smptebars", 5), ("mandelbrot", 5), ("color=c=blue", 5)],
+    },
+    "hd_1080p30": {
+        "size": "1920x1080",
+        "rate": 30,
+        "segments": [("testsrc2", 4), ("mandelbrot", 4), ("smptebars", 3), ("color=c=green", 3)],
+    },
+    "hfr_720p60": {
+        "size": "1280x720",
+        "rate": 60,
+        "segments": [("mandelbrot", 3), ("testsrc", 3), ("rgbtestsrc", 3), ("testsrc2", 3)],
+    },
+    "short_shots": {
+        "size": "854x480",
+        "rate": 24,
+        "segments": [("testsrc", 1.5), ("smptebars", 0.6), ("color=c=yellow", 0.8), ("mandelbrot", 2), ("rgbtestsrc", 1)],
+    },
+}
+
+# 配置名 -> 覆盖的 SceneDetector 属性；未列出的属性使用下列默认值
+BASE_CONFIG = {
+    "detect_mode": "multi_pass",
+    "detect_profile": "full",
+    "detect_backend": "ffmpeg",
+    "parallel_workers": 0,
+    "threshold_mode": "fixed",
+}
+CONFIGS: Dict[str, dict] = {
+    "multi_pass": {},
+    "single_pass": {"detect_mode": "single_pass"},
+    "single_pass_fast": {"detect_mode": "single_pass", "detect_profile": "fast"},
+    "single_pass_parallel": {
+        "detect_mode": "single_pass",
+        "parallel_workers": os.cpu_count() or 1,
+        "parallel_chunk_seconds": 5.0,
+        "parallel_min_duration": 0.0,
+    },
+    "opencv": {"detect_backend": "opencv"},
+    "adaptive": {"threshold_mode": "adaptive"},
+    "coarse_to_fine": {"detect_mode": "coarse_to_fine"},
+}
+
+
+def generate_video(name: str, scenario: dict, workdir: str) -> dict:
+    """生成合成视频，返回 {path, ground_truth, tolerance_extra}。已存在则直接复用。"""
+    path = os.path.join(workdir, f"{name}.mp4")
+    size, rate = scenario["size"], scenario["rate"]
+    fade = scenario.get("fade", 0.0)
+    segments = scenario["segments"]
+
+    cmd = ["ffmpeg", "-hide_banner", "-v", "error", "-y"]
+    for source, _ in segments:
+        separator = ":" if "=" in source else "="
+        cmd.extend(["-f", "lavfi", "-i", f"{source}{separator}size={size}:rate={rate}"])
+
+    filters = [
+        f"[{idx}:v]trim=duration={duration},setpts=PTS-STARTPTS,format=yuv420p,setsar=1[s{idx}]"
+        for idx, (_, duration) in enumerate(segments)
+    ]
+    ground_truth: List[float] = []
+    if fade > 0:
+        # xfade 链：每次转场与前一段重叠 fade 秒，真值取转场中点
+        label = "s0"
+        elapsed = segments[0][1]
+        for idx in range(1, len(segments)):
+            offset = elapsed - fade
+            ground_truth.append(round(offset + fade / 2, 3))
+            filters.append(f"[{label}][s{idx}]xfade=transition=fade:duration={fade}:offset={offset}[x{idx}]")
+            label = f"x{idx}"
+            elapsed = offset + segments[idx][1]
+        output_label = label
+    else:
+        elapsed = 0.0
+        for _, duration in segments[:-1]:
+            elapsed += duration
+            ground_truth.append(round(elapsed, 3))
+        inputs = "".join(f"[s{idx}]" for idx in range(len(segments)))
+        filters.append(f"{inputs}concat=n={len(segments)}:v=1:a=0[out]")
+        output_label = "out"
+
+    if not os.path.exists(path):
+        cmd.extend(
+            [
+                "-filter_complex",
+                ";".join(filters),
+                "-map",
+                f"[{output_label}]",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-g",
+                str(rate * 10),
+                path,
+            ]
+        )
+        subprocess.run(cmd, check=True, timeout=600)
+    return {"path": path, "ground_truth": ground_truth, "tolerance_extra": fade / 2}
+
+
+def run_case(video_path: str, overrides: dict) -> dict:
+    """在子进程中执行一次检测并统计资源占用。"""
+    detector = SceneDetector()
+    for key, value in {**BASE_CONFIG, **overrides}.items():
+        setattr(detector, key, value)
+
+    started = time.perf_counter()
+    cuts = detector.detect_scenes(video_path)
+    elapsed = time.perf_counter() - started
+
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: macOS 为字节，Linux 为 KB
+    return {
+        "seconds": elapsed,
+        "cuts": inner_cut_times(cuts),
+        "fallback": any(cut["type"] == "fallback" for cut in cuts),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    scenario_names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    config_names = args.configs.split(",") if args.configs else list(CONFIGS)
+    unknown = [name for name in scenario_names if name not in SCENARIOS] + [
+        name for name in config_names if name not in CONFIGS
+    ]
+    if unknown:
+        raise SystemExit(f"未知的场景或配置: {', '.join(unknown)}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="scene_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    for scenario_name in scenario_names:
+        video = generate_video(scenario_name, SCENARIOS[scenario_name], workdir)
+        info = media_probe.probe(video["path"])
+        frames = info["frame_count"] or int(info["duration"] * info["fps"])
+        tolerance = args.tolerance_frames / info["fps"] + video["tolerance_extra"]
+
+        for config_name in config_names:
+            # spawn 保证每个用例都是全新进程，峰值内存不被前一个用例污染
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                case = pool.submit(run_case, video["path"], CONFIGS[config_name]).result()
+            metrics = match_cuts(video["ground_truth"], case["cuts"], tolerance=tolerance)
+            results.append(
+                {
+                    "scenario": scenario_name,
+                    "config": config_name,
+                    "resolution": f"{info['width']}x{info['height']}",
+                    "fps": round(info["fps"], 3),
+                    "frames": frames,
+                    "wall_seconds": round(case["seconds"], 3),
+                    "decode_fps": round(frames / case["seconds"], 1) if case["seconds"] else None,
+                    "peak_rss_mb": round(case["peak_rss_mb"], 1),
+                    "peak_ffmpeg_rss_mb": round(case["peak_child_rss_mb"], 1),
+                    "fallback": case["fallback"],
+                    "ground_truth": video["ground_truth"],
+                    "cuts": case["cuts"],
+                    **metrics,
+                }
+            )
+
+    summary = {}
+    for config_name in config_names:
+        rows = [row for row in results if row["config"] == config_name]
+        matched = sum(row["matched"] for row in rows)
+        candidate = sum(row["candidate"] for row in rows)
+        reference = sum(row["reference"] for row in rows)
+        summary[config_name] = {
+            "wall_seconds": round(sum(row["wall_seconds"] for row in rows), 3),
+            "decode_fps": round(sum(row["frames"] for row in rows) / sum(row["wall_seconds"] for row in rows), 1),
+            "peak_rss_mb": max(row["peak_rss_mb"] for row in rows),
+            "precision": round(matched / candidate, 4) if candidate else None,
+            "recall": round(matched / reference, 4) if reference else None,
+        }
+
+    return {
+        "workdir": workdir,
+        "tolerance_frames": args.tolerance_frames,
+        "cpu_count": os.cpu_count(),
+        "summary": summary,
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SceneDetector 合成视频基准测试")
+    parser.add_argument("--scenarios", help=f"逗号分隔，可选: {', '.join(SCENARIOS)}")
+    parser.add_argument("--configs", help=f"逗号分隔，可选: {', '.join(CONFIGS)}")
+    parser.add_argument("--workdir", help="合成视频目录，指定后可复用已生成的视频")
+    parser.add_argument("--tolerance-frames", type=float, default=2.0, help="切点匹配容差（帧）")
+    parser.add_argument("--output", help="报告输出路径，默认打印到 stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+对比 SceneDetector 的 fast 档位与 full 档位的切点精度和耗时。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.scene_profile_report video1.mp4 [video2.mp4 ...] \
+        [--height 240] [--gray] [--max-fps 0] [--tolerance-frames 2] [--output report.json]
+
+以 full 档位结果为基准，输出每个视频及汇总的 precision / recall / 耗时加速比（JSON）。
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.cut_metrics import inner_cut_times, match_cuts
+from services.media_probe import media_probe
+from services.scene_detector import SceneDetector
+
+
+def run_profile(video_path: str, profile: str, args: argparse.Namespace) -> dict:
+    detector = SceneDetector()
+    # 两个档位都走 single_pass，保证只比较降采样本身的影响
+    detector.detect_mode = "single_pass"
+    detector.detect_profile = profile
+    detector.fast_height = args.height
+    detector.fast_grayscale = args.gray
+    detector.fast_max_fps = args.max_fps
+
+    started = time.perf_counter()
+    cuts = detector.detect_scenes(video_path)
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "fallback": any(cut["type"] == "fallback" for cut in cuts),
+        "cuts": inner_cut_times(cuts),
+    }
+
+
+def build_report(args: argparse.Namespace) -> dict:
+    videos = []
+    totals = {"full_seconds": 0.0, "fast_seconds": 0.0, "reference": 0, "candidate": 0, "matched": 0}
+    for video_path in args.videos:
+        fps = media_probe.get_fps(video_path)
+        full = run_profile(video_path, "full", args)
+        fast = run_profile(video_path, "fast", args)
+        metrics = match_cuts(full["cuts"], fast["cuts"], tolerance=args.tolerance_frames / fps)
+        videos.append(
+            {
+                "video": video_path,
+                "fps": round(fps, 3),
+                "full": full,
+                "fast": fast,
+                "speedup": round(full["seconds"] / fast["seconds"], 2) if fast["seconds"] else None,
+                **metrics,
+            }
+        )
+        totals["full_seconds"] += full["seconds"]
+        totals["fast_seconds"] += fast["seconds"]
+        for key in ("reference", "candidate", "matched"):
+            totals[key] += metrics[key]
+
+    summary = {
+        "videos": len(videos),
+        "full_seconds": round(totals["full_seconds"], 3),
+        "fast_seconds": round(totals["fast_seconds"], 3),
+        "speedup": round(totals["full_seconds"] / totals["fast_seconds"], 2) if totals["fast_seconds"] else None,
+        "precision": round(totals["matched"] / totals["candidate"], 4) if totals["candidate"] else None,
+        "recall": round(totals["matched"] / totals["reference"], 4) if totals["reference"] else None,
+    }
+    return {
+        "fast_profile": {"height": args.height, "grayscale": args.gray, "max_fps": args.max_fps},
+        "tolerance_frames": args.tolerance_frames,
+        "summary": summary,
+        "results": videos,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SceneDetector fast/full 档位精度对比")
+    parser.add_argument("videos", nargs="+", help="待对比的视频文件")
+    parser.add_argument("--height", type=int, default=240, help="fast 档位降采样高度")
+    parser.add_argument("--gray", action="store_true", help="fast 档位转灰度")
+    parser.add_argument("--max-fps", type=float, default=0.0, help="fast 档位帧率上限，0 表示不限制")
+    parser.add_argument("--tolerance-frames", type=float, default=2.0, help="切点匹配容差（帧）")
+    parser.add_argument("--output", help="报告输出路径，默认打印到 stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(build_report(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 from typing import List, Optional, Union
 import os
@@ -15,12 +16,17 @@ import time
 import logging
 import httpx
 import asyncio
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
-from services.scene_detector import SceneDetector
+from services.scene_detector import SceneDetector, SceneDetectionError
+from services.scene_score_cache import SceneScoreCache
+from services.analysis_jobs import AnalysisJobManager, normalize_cut_boundaries
 from services.exporter import Exporter
 from services.youtube_downloader import YouTubeDownloader
 from services.frame_service import FrameService, FrameServiceError
+from services.ingest_pipeline import IngestPipeline, IngestPipelineError
 from services.asset_generator import AssetGenerator, AssetGenerationError
 
 from services.workspace_manager import WorkspaceManager
@@ -44,6 +50,8 @@ app = FastAPI(title="AI Shot Workbench API")
 async def shutdown_event():
     """服务关闭时清理所有任务"""
     print("🛑 服务关闭中...")
+    analysis_job_manager.shutdown()
+    frame_service.shutdown()
     # 云雾 API 任务会自动清理
 
 
@@ -60,6 +68,7 @@ app.add_middleware(
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 TRANSCODE_DIR = "transcodes"
+SCENE_SCORE_DIR = "scene_scores"
 WORKSPACES_DIR = "../workspaces"  # Move outside backend to prevent auto-reload loop
 REFERENCE_GALLERY_DIR = "reference_gallery"
 REFERENCE_IMAGES_DIR = os.path.join(REFERENCE_GALLERY_DIR, "images")
@@ -78,6 +87,19 @@ os.makedirs(WORKSPACES_DIR, exist_ok=True)
 workspace_manager = WorkspaceManager(WORKSPACES_DIR)
 file_watcher = FileWatcher()
 frame_service = FrameService(TRANSCODE_DIR)
+scene_score_cache = SceneScoreCache(SCENE_SCORE_DIR)
+analysis_job_manager = AnalysisJobManager(
+    TRANSCODE_DIR,
+    SCENE_SCORE_DIR,
+    max_workers=int(os.getenv("ANALYSIS_JOB_WORKERS", "0")) or None,
+    # 已结束任务在内存中保留的秒数，<=0 表示不清理
+    job_ttl_seconds=float(os.getenv("ANALYSIS_JOB_TTL_SECONDS", "3600")),
+)
+# ANALYZE_INGEST_MODE=fused: 一次解码同时产出编辑版、scene 分数、缩略图与音频峰值
+ANALYZE_INGEST_MODE = os.getenv("ANALYZE_INGEST_MODE", "separate").strip().lower()
+ingest_pipeline = IngestPipeline(frame_service, scene_score_cache)
+# 边上传边检测时排队等待解码的请求体块数上限（超出即暂停读取网络数据）
+UPLOAD_STREAM_QUEUE_CHUNKS = int(os.getenv("UPLOAD_STREAM_QUEUE_CHUNKS", "64"))
 asset_generator = AssetGenerator()
 image_preset_manager = ImagePresetManager(IMAGE_PRESETS_PATH)
 
@@ -236,6 +258,7 @@ class AnalyzeResponse(BaseModel):
     cuts: List[CutPoint]
     session_id: Optional[str] = None
     edit_video_url: Optional[str] = None
+    transcode_status: Optional[str] = None
 
 class ExportRequest(BaseModel):
     video_path: str
@@ -252,6 +275,33 @@ class GenerateAssetsRequest(BaseModel):
     hidden_segments: Optional[List[float]] = []
     hidden_segments: Optional[List[float]] = []
 
+class SceneRetuneRequest(BaseModel):
+    session_id: Optional[str] = None
+    video_path: Optional[str] = None
+    primary_threshold: Optional[float] = None
+    min_scene_duration: Optional[float] = None
+    merge_frame_threshold: Optional[int] = None
+
+class SceneRetuneResponse(BaseModel):
+    duration: float
+    cuts: List[CutPoint]
+
+class RedetectWindowRequest(BaseModel):
+    session_id: Optional[str] = None
+    video_path: Optional[str] = None
+    start: float
+    end: float
+    threshold: Optional[float] = None
+    cuts: List[CutPoint]
+
+class RedetectWindowResponse(BaseModel):
+    duration: float
+    cuts: List[CutPoint]
+    added: List[float]
+
+class FrameBatchRequest(BaseModel):
+    timecodes: List[float]
+
 class YouTubeRequest(BaseModel):
     url: str
     cookies_from_browser: Optional[str] = None
@@ -1314,28 +1364,83 @@ async def update_step(workspace_path: str, data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze_video(file: UploadFile = File(...)):
+def detect_video_cuts(video_path: str):
+    """阻塞执行场景检测，返回 (补齐首尾的切点, 时长)；在线程池中调用"""
+    detector = SceneDetector(score_cache=scene_score_cache)
+    cuts = detector.detect_scenes(video_path)
+    duration = detector.get_duration(video_path)
+    # coarse_to_fine 不产出全片逐帧分数，后台补齐供 /api/analyze/retune 使用
+    warm_scene_scores(video_path)
+    return normalize_cut_boundaries(cuts, duration), duration
+
+
+scene_score_warmups: set = set()
+scene_score_warmups_lock = threading.Lock()
+
+
+def warm_scene_scores(video_path: str) -> bool:
+    """
+    后台解码一次逐帧分数写入 scene_score_cache，同一视频同时只跑一次。
+    缓存已存在时直接返回 False，已启动或正在生成时返回 True。
+    """
+    detector = SceneDetector(score_cache=scene_score_cache)
+    key = detector.score_cache_key(scene_score_cache.signature_for(video_path))
+    with scene_score_warmups_lock:
+        if key in scene_score_warmups:
+            return True
+        if scene_score_cache.has(key):
+            return False
+        scene_score_warmups.add(key)
+
+    def run() -> None:
+        try:
+            detector.get_scene_scores(video_path)
+        except SceneDetectionError as exc:
+            logger.warning(f"场景分数预热失败: {video_path}, 错误: {exc}")
+        finally:
+            with scene_score_warmups_lock:
+                scene_score_warmups.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+
+def save_upload_file(file: UploadFile) -> str:
     video_path = os.path.join(UPLOAD_DIR, file.filename)
     with open(video_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
-    
-    detector = SceneDetector()
-    cuts = detector.detect_scenes(video_path)
-    
-    # Add start (0.0) and end points
-    duration = detector.get_duration(video_path)
-    if not cuts or cuts[0]["time"] != 0.0:
-        cuts.insert(0, {"time": 0.0, "type": "auto"})
-    if cuts[-1]["time"] < duration:
-        cuts.append({"time": duration, "type": "auto"})
+    return video_path
+
+
+@app.post("/api/analyze", response_model=AnalyzeResponse)
+async def analyze_video(file: UploadFile = File(...)):
+    # 检测与转码都是长时间阻塞调用，放到线程池执行，避免卡住事件循环
+    video_path = await asyncio.to_thread(save_upload_file, file)
+    if ANALYZE_INGEST_MODE == "fused":
+        try:
+            ingest = await asyncio.to_thread(ingest_pipeline.ingest, video_path)
+            return {
+                "video_path": video_path,
+                "duration": ingest["duration"],
+                "cuts": normalize_cut_boundaries(ingest["cuts"], ingest["duration"]),
+                "session_id": ingest["session"]["session_id"],
+                "edit_video_url": ingest["session"]["edit_url_segment"],
+            }
+        except (IngestPipelineError, FrameServiceError) as e:
+            # 融合导入失败时退回分步检测 + 转码
+            print(f"[ingest] {e}")
+
+    cuts, duration = await asyncio.to_thread(detect_video_cuts, video_path)
 
     session_id = None
     edit_url = None
+    transcode_status = None
     try:
-        session = frame_service.ensure_session(video_path, duration)
+        # 编辑版在后台转码，不阻塞分析结果返回
+        session = await asyncio.to_thread(frame_service.start_session, video_path, duration)
         session_id = session["session_id"]
         edit_url = session["edit_url_segment"]
+        transcode_status = session["transcode_status"]
     except FrameServiceError as e:
         print(f"[frame_service] {e}")
 
@@ -1345,8 +1450,232 @@ async def analyze_video(file: UploadFile = File(...)):
         "cuts": cuts,
         "session_id": session_id,
         "edit_video_url": edit_url,
+        "transcode_status": transcode_status,
     }
 
+@app.put("/api/analyze/upload/{file_name}", response_model=AnalyzeResponse)
+async def analyze_streaming_upload(file_name: str, request: Request):
+    """
+    边上传边检测：请求体为原始视频字节（非 multipart），每收到一块就写入 uploads/ 并送入 ffmpeg，
+    检测与网络传输重叠；上传结束后再生成编辑版。返回格式与 /api/analyze 一致
+    """
+    video_path = os.path.join(UPLOAD_DIR, os.path.basename(file_name))
+    detector = SceneDetector(score_cache=scene_score_cache)
+    # 有界队列：解码慢于网络时暂停读取请求体，未处理的数据不会在内存中堆积
+    chunks: queue.Queue = queue.Queue(maxsize=UPLOAD_STREAM_QUEUE_CHUNKS)
+    detection = asyncio.create_task(
+        asyncio.to_thread(detector.detect_scenes_from_stream, iter(chunks.get, None), video_path)
+    )
+
+    async def enqueue(item: Optional[bytes]) -> bool:
+        # 检测线程异常退出后不再消费，带超时重试，避免永久阻塞
+        while not detection.done():
+            try:
+                await asyncio.to_thread(chunks.put, item, timeout=1.0)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        async for chunk in request.stream():
+            if chunk and not await enqueue(chunk):
+                break
+    except BaseException:
+        # 客户端断开或读取请求体出错：先让检测线程结束并关闭文件，再删除不完整的上传
+        await enqueue(None)
+        await asyncio.gather(detection, return_exceptions=True)
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        raise
+    await enqueue(None)
+
+    try:
+        cuts = await detection
+        duration = detector.get_duration(video_path)
+    except SceneDetectionError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    cuts = normalize_cut_boundaries(cuts, duration)
+
+    session_id = None
+    edit_url = None
+    transcode_status = None
+    try:
+        # 编辑版在后台转码，不阻塞分析结果返回
+        session = await asyncio.to_thread(frame_service.start_session, video_path, duration)
+        session_id = session["session_id"]
+        edit_url = session["edit_url_segment"]
+        transcode_status = session["transcode_status"]
+    except FrameServiceError as e:
+        print(f"[frame_service] {e}")
+
+    return {
+        "video_path": video_path,
+        "duration": duration,
+        "cuts": cuts,
+        "session_id": session_id,
+        "edit_video_url": edit_url,
+        "transcode_status": transcode_status,
+    }
+
+@app.post("/api/analyze/jobs")
+async def create_analysis_job(file: UploadFile = File(...)):
+    """
+    提交后台分析任务，立即返回 job_id；检测与转码在进程池中并发执行。
+    关键帧 preview 临时切点在后台生成，就绪后出现在任务快照中，检测完成后以 result 为准
+    """
+    video_path = await asyncio.to_thread(save_upload_file, file)
+    return analysis_job_manager.submit(video_path, preview=True)
+
+@app.get("/api/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """查询分析任务状态；completed 时 result 与 /api/analyze 返回格式一致"""
+    job = analysis_job_manager.snapshot(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@app.post("/api/analyze/batch")
+async def create_analysis_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    paths: Optional[List[str]] = Form(None),
+):
+    """
+    批量分析：接收多个上传文件和/或 uploads/ 下已有文件名，
+    每个视频作为一个后台任务提交到按 CPU 核数限流的进程池
+    """
+    video_paths = [await asyncio.to_thread(save_upload_file, file) for file in files or []]
+    missing = []
+    for path in paths or []:
+        candidate = os.path.join(UPLOAD_DIR, os.path.basename(path))
+        if os.path.exists(candidate):
+            video_paths.append(candidate)
+        else:
+            missing.append(path)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Video file not found: {', '.join(missing)}")
+    if not video_paths:
+        raise HTTPException(status_code=400, detail="files 和 paths 不能同时为空")
+    return analysis_job_manager.submit_batch(video_paths)
+
+@app.get("/api/analyze/batch/{batch_id}")
+async def get_analysis_batch(batch_id: str):
+    batch = analysis_job_manager.batch_snapshot(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="批量任务不存在")
+    return batch
+
+@app.get("/api/analyze/batch/{batch_id}/events")
+async def analysis_batch_events(batch_id: str):
+    """SSE 推送批量任务进度：每个视频结束时推送 result，全部结束后推送 done"""
+    if not analysis_job_manager.batch_snapshot(batch_id):
+        raise HTTPException(status_code=404, detail="批量任务不存在")
+
+    async def event_generator():
+        reported = set()
+        while True:
+            batch = analysis_job_manager.batch_snapshot(batch_id)
+            for job in batch["jobs"]:
+                if job["status"] in ("completed", "failed") and job["job_id"] not in reported:
+                    reported.add(job["job_id"])
+                    yield {"event": "result", "data": json.dumps(job, ensure_ascii=False)}
+            summary = {key: batch[key] for key in ("batch_id", "status", "total", "completed", "failed")}
+            if batch["status"] == "completed":
+                yield {"event": "done", "data": json.dumps(summary, ensure_ascii=False)}
+                break
+            yield {"event": "progress", "data": json.dumps(summary, ensure_ascii=False)}
+            await asyncio.sleep(1)
+
+    return EventSourceResponse(event_generator())
+
+@app.get("/api/analyze/preview", response_model=SceneRetuneResponse)
+def preview_scene_cuts(file_name: str):
+    """关键帧预览切点（视频需已上传到 uploads/）：不解码，只读 packet 标志位"""
+    video_path = os.path.join(UPLOAD_DIR, os.path.basename(file_name))
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video file not found")
+    try:
+        return SceneDetector().preview_scenes(video_path)
+    except SceneDetectionError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+@app.get("/api/analyze/stream")
+def analyze_video_stream(file_name: str):
+    """
+    SSE 流式场景检测（视频需已上传到 uploads/）：
+    边解码边推送 cut / progress 事件，结束时推送 done（含最终切点），失败推送 error
+    """
+    video_path = os.path.join(UPLOAD_DIR, os.path.basename(file_name))
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video file not found")
+
+    detector = SceneDetector(score_cache=scene_score_cache)
+
+    def event_generator():
+        try:
+            for event in detector.iter_detect_events(video_path):
+                name = event.pop("event")
+                if name == "done":
+                    event["video_path"] = video_path
+                yield {"event": name, "data": json.dumps(event, ensure_ascii=False)}
+        except SceneDetectionError as exc:
+            yield {"event": "error", "data": json.dumps({"error": str(exc)}, ensure_ascii=False)}
+
+    # 同步生成器由 EventSourceResponse 放到线程池迭代，不阻塞事件循环
+    return EventSourceResponse(event_generator())
+
+def resolve_analysis_video(session_id: Optional[str], video_path: Optional[str]) -> str:
+    """优先使用 video_path，否则通过 session 元数据找回源视频"""
+    if not video_path and session_id:
+        try:
+            video_path = str(frame_service.get_source_path(session_id))
+        except FrameServiceError as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+    if not video_path or not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video file not found")
+    return video_path
+
+@app.post("/api/analyze/retune", response_model=SceneRetuneResponse)
+def retune_scene_cuts(request: SceneRetuneRequest):
+    """
+    用缓存的逐帧 scene 分数按新参数重新计算切点，不调用 ffmpeg。
+    缓存未命中时在后台生成分数并返回 202，前端稍后重试即可。
+    """
+    detector = SceneDetector(score_cache=scene_score_cache).with_overrides(
+        primary_threshold=request.primary_threshold,
+        min_scene_duration=request.min_scene_duration,
+        merge_frame_threshold=request.merge_frame_threshold,
+    )
+
+    # session_id 与分数缓存使用同一视频签名，命中时无需定位源文件
+    data = scene_score_cache.load(detector.score_cache_key(request.session_id)) if request.session_id else None
+    if data is None:
+        video_path = resolve_analysis_video(request.session_id, request.video_path)
+        key = detector.score_cache_key(scene_score_cache.signature_for(video_path))
+        data = scene_score_cache.load(key)
+        if data is None:
+            warm_scene_scores(video_path)
+            return JSONResponse(status_code=202, content={"detail": "逐帧分数生成中，请稍后重试"})
+
+    cuts = detector.detect_from_scores(data["times"], data["scores"], data["duration"], data["fps"])
+    return {"duration": data["duration"], "cuts": cuts}
+
+@app.post("/api/analyze/redetect", response_model=RedetectWindowResponse)
+def redetect_scene_window(request: RedetectWindowRequest):
+    """只在 [start, end) 内用新阈值重新检测切点，窗口外的切点保持不变"""
+    video_path = resolve_analysis_video(request.session_id, request.video_path)
+    detector = SceneDetector(score_cache=scene_score_cache)
+    try:
+        return detector.redetect_window(
+            video_path,
+            request.start,
+            request.end,
+            [cut.dict() for cut in request.cuts],
+            threshold=request.threshold,
+        )
+    except SceneDetectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
 @app.post("/api/export")
 async def export_project(request: ExportRequest):
     if not os.path.exists(request.video_path):
@@ -1431,18 +1760,10 @@ async def download_youtube(request: YouTubeRequest):
             cookies_from_browser=request.cookies_from_browser,
             cookies_file=request.cookies_file,
         )
-        video_info = downloader.download(request.url)
-
-        detector = SceneDetector()
-        cuts = detector.detect_scenes(video_info["video_path"])
-
-        duration = detector.get_duration(video_info["video_path"])
-        if not cuts or cuts[0]["time"] != 0.0:
-            cuts.insert(0, {"time": 0.0, "type": "auto"})
-        if cuts[-1]["time"] < duration:
-            cuts.append({"time": duration, "type": "auto"})
+        video_info = await asyncio.to_thread(downloader.download, request.url)
 
-        session = frame_service.ensure_session(video_info["video_path"], duration)
+        cuts, duration = await asyncio.to_thread(detect_video_cuts, video_info["video_path"])
+        session = await asyncio.to_thread(frame_service.start_session, video_info["video_path"], duration)
 
         return {
             "video_path": video_info["video_path"],
@@ -1450,27 +1771,189 @@ async def download_youtube(request: YouTubeRequest):
             "cuts": cuts,
             "session_id": session["session_id"],
             "edit_video_url": session["edit_url_segment"],
+            "transcode_status": session["transcode_status"],
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"YouTube download failed: {str(e)}")
 
 
+@app.post("/api/transcode/{session_id}/tiers/{tier}")
+async def start_proxy_tier(session_id: str, tier: str):
+    """按需为已有 session 的源视频生成其它档位的编辑版（如 full 原分辨率），后台转码并立即返回"""
+    try:
+        source = frame_service.get_source_path(session_id)
+        return await asyncio.to_thread(frame_service.start_session, str(source), None, tier)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+@app.get("/api/transcode/status/{session_id}")
+async def get_transcode_status(session_id: str):
+    """编辑版转码状态：pending / running / ready / failed，percent 来自 ffmpeg -progress"""
+    try:
+        return frame_service.get_transcode_status(session_id)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
 @app.get("/api/transcode/video/{session_id}")
 async def get_transcoded_video(session_id: str):
+    """编辑版视频；转码未完成时返回已完成分段拼成的 fMP4 流（可边转码边播放）"""
     try:
         path = frame_service.get_edit_video_path(session_id)
+    except FrameServiceError:
+        try:
+            chunks = frame_service.iter_partial_video(session_id)
+            first = next(chunks)
+        except (FrameServiceError, StopIteration) as exc:
+            raise HTTPException(status_code=404, detail="编辑版视频未就绪") from exc
+
+        def stream():
+            yield first
+            yield from chunks
+
+        return StreamingResponse(stream(), media_type="video/mp4", headers={"Cache-Control": "no-store"})
+    return FileResponse(path, media_type="video/mp4", filename=os.path.basename(path))
+
+
+@app.get("/api/transcode/hls/{session_id}/{name}")
+async def get_transcoded_hls(session_id: str, name: str):
+    """编辑版 HLS（fMP4 分段），播放列表随转码进度增长"""
+    try:
+        path = frame_service.get_hls_path(session_id, name)
     except FrameServiceError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
-    return FileResponse(path, media_type="video/mp4", filename=os.path.basename(path))
+    # 播放列表在转码期间持续更新，分段写完后不再变化
+    cache_control = "no-cache" if path.suffix == ".m3u8" else "public, max-age=31536000, immutable"
+    return FileResponse(
+        path,
+        media_type=FrameService.HLS_MEDIA_TYPES[path.suffix],
+        headers={"Cache-Control": cache_control},
+    )
+
+
+@app.get("/api/sprites/{session_id}")
+def get_sprite_index(session_id: str):
+    """时间轴雪碧图索引（首次请求时一次解码生成全部层级）"""
+    try:
+        return frame_service.ensure_sprites(session_id)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@app.get("/api/sprites/{session_id}/{name}")
+async def get_sprite_sheet(session_id: str, name: str):
+    try:
+        path = frame_service.get_sprite_path(session_id, name)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    # session_id 即源视频签名，同名雪碧图内容不会变化
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
 
 
 @app.get("/api/frame/{session_id}")
-async def get_frame(session_id: str, time: float):
+def get_frame(
+    session_id: str,
+    time: float,
+    request: Request,
+    width: Optional[int] = None,
+    quality: Optional[int] = None,
+    fmt: str = Query("jpeg", alias="format"),
+):
+    """
+    width 为目标宽度（只缩小不放大），quality 为 1-100，format 为 jpeg（默认）/ webp；
+    format=auto 时按 Accept 协商，请求方声明支持 WebP 才返回 WebP
+    """
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if fmt.lower() == "auto":
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        headers["Vary"] = "Accept"
+    try:
+        headers["ETag"] = FrameService.frame_etag(session_id, time, width=width, quality=quality, fmt=fmt)
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        data = frame_service.get_frame_bytes(session_id, time, width=width, quality=quality, fmt=fmt)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return Response(content=data, media_type=FrameService.frame_media_type(fmt), headers=headers)
+
+
+@app.get("/api/frame-cache/stats")
+async def get_frame_cache_stats():
+    """内存帧缓存命中 / 淘汰统计"""
+    return frame_service.memory_cache.stats()
+
+
+@app.get("/api/ingest/{session_id}")
+async def get_ingest_manifest(session_id: str):
+    """融合导入产物清单：缩略图间隔与数量、音频峰值"""
+    manifest = ingest_pipeline.load_manifest(session_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="导入产物不存在")
+    return manifest
+
+
+@app.get("/api/ingest/{session_id}/thumbnails/{index}")
+async def get_ingest_thumbnail(session_id: str, index: int):
+    thumb_path = ingest_pipeline.get_thumbnail(session_id, index)
+    if thumb_path is None:
+        raise HTTPException(status_code=404, detail="缩略图不存在")
+    return FileResponse(thumb_path, media_type="image/jpeg", filename=thumb_path.name)
+
+
+FRAME_BATCH_LIMIT = 200
+
+
+def build_frame_multipart(timecodes: List[float], frame_paths: List[Path]) -> Response:
+    """multipart/form-data 响应：每帧一个 part，name 为 3 位小数的时间码，前端可直接 resp.formData() 解析"""
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for timecode, frame_path in zip(timecodes, frame_paths):
+        body += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{timecode:.3f}"; filename="{frame_path.name}"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode("utf-8")
+        body += frame_path.read_bytes()
+        body += b"\r\n"
+    body += f"--{boundary}--\r\n".encode("utf-8")
+    return Response(content=bytes(body), media_type=f"multipart/form-data; boundary={boundary}")
+
+
+@app.post("/api/frames/{session_id}")
+def get_frames(session_id: str, request: FrameBatchRequest):
+    """批量取帧：一个 ffmpeg 进程提取所有未缓存的帧，以 multipart/form-data 一次返回"""
+    if not request.timecodes:
+        raise HTTPException(status_code=400, detail="timecodes 不能为空")
+    if len(request.timecodes) > FRAME_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"单次最多 {FRAME_BATCH_LIMIT} 帧")
+    try:
+        frame_paths = frame_service.get_frames(session_id, request.timecodes)
+    except FrameServiceError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return build_frame_multipart(request.timecodes, frame_paths)
+
+
+@app.get("/api/frame/{session_id}/neighborhood")
+def get_frame_neighborhood(session_id: str, time: float, radius: int = 1, delta: Optional[float] = None):
+    """
+    一次返回中心帧及前后 radius 帧（默认即 prev/current/next 三帧），按编辑版帧率对齐到帧网格。
+    delta 为相邻帧间隔（秒），换算为整数帧步长，缺省为 1 帧；multipart part 名为实际帧时间
+    """
+    if not 0 <= radius <= 10:
+        raise HTTPException(status_code=400, detail="radius 需在 0-10 之间")
     try:
-        frame_path = frame_service.get_frame(session_id, time)
+        step = 1
+        if delta:
+            fps = frame_service.get_fps(session_id)
+            step = max(int(round(delta * fps)), 1)
+        frames = frame_service.get_frame_neighborhood(session_id, time, radius=radius, step=step)
     except FrameServiceError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    return FileResponse(frame_path, media_type="image/jpeg", filename=os.path.basename(frame_path))
+    return build_frame_multipart([t for t, _ in frames], [path for _, path in frames])
 
 
 # ==================== Image Provider Management API ====================
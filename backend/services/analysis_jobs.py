@@ -0,0 +1,242 @@
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.frame_service import FrameService
+from services.scene_detector import SceneDetectionError, SceneDetector
+from services.scene_score_cache import SceneScoreCache
+
+
+def normalize_cut_boundaries(cuts: List[dict], duration: float) -> List[dict]:
+    """补齐起点 0.0 与终点 duration，与 /api/analyze 返回格式保持一致。"""
+    cuts = list(cuts)
+    if not cuts or cuts[0]["time"] != 0.0:
+        cuts.insert(0, {"time": 0.0, "type": "auto"})
+    if cuts[-1]["time"] < duration:
+        cuts.append({"time": duration, "type": "auto"})
+    return cuts
+
+
+def run_scene_preview(video_path: str) -> Optional[dict]:
+    """关键帧预览切点，只读 packet 标志位，在主进程的线程池中执行；失败时返回 None。"""
+    try:
+        return SceneDetector().preview_scenes(video_path)
+    except SceneDetectionError:
+        return None
+
+
+# Worker 函数需为模块级，便于在子进程中 pickle 调用 ------------------------
+
+def run_scene_detection(video_path: str, score_dir: str) -> dict:
+    detector = SceneDetector(score_cache=SceneScoreCache(score_dir))
+    cuts = detector.detect_scenes(video_path)
+    duration = detector.get_duration(video_path)
+    return {"cuts": normalize_cut_boundaries(cuts, duration), "duration": duration}
+
+
+def run_edit_proxy(video_path: str, transcode_dir: str) -> dict:
+    duration = SceneDetector().get_duration(video_path)
+    return FrameService(transcode_dir).ensure_session(video_path, duration or None)
+
+
+class AnalysisJobManager:
+    """
+    后台分析任务：场景检测与编辑版转码在进程池中并发执行，接口立即返回 job_id。
+    任务状态只保存在内存中，按 future 状态实时计算进度。
+    批量任务（batch）只是一组 job 的集合，共享同一个按 CPU 核数限流的进程池。
+    提交时可要求生成关键帧预览切点（preview）：提交后在线程池中计算，不阻塞返回 job_id，
+    就绪后出现在快照中，检测完成前先给前端展示。
+    已结束的 job / batch 超过 job_ttl_seconds 后在下次提交时清理，避免常驻进程内存只增不减。
+    """
+
+    STAGES = ("detect", "transcode")
+
+    def __init__(
+        self,
+        transcode_dir: str = "transcodes",
+        score_dir: str = "scene_scores",
+        max_workers: Optional[int] = None,
+        job_ttl_seconds: float = 3600.0,
+    ) -> None:
+        self.transcode_dir = os.path.abspath(transcode_dir)
+        self.score_dir = os.path.abspath(score_dir)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._preview_executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, dict] = {}
+        self._batches: Dict[str, dict] = {}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # 延迟创建，避免仅导入模块就拉起子进程；
+        # 使用 spawn 避免 fork 继承服务进程中的线程与锁（事件循环、解码池等）
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @property
+    def preview_executor(self) -> ThreadPoolExecutor:
+        # 预览只读 packet 标志位、耗时短，放在主进程线程中即可
+        if self._preview_executor is None:
+            self._preview_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="scene-preview")
+        return self._preview_executor
+
+    def submit(self, video_path: str, preview: bool = False) -> dict:
+        self._prune_finished()
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "video_path": video_path,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "finished_at": None,
+            "preview": self.preview_executor.submit(run_scene_preview, video_path) if preview else None,
+            "futures": {
+                "detect": self.executor.submit(run_scene_detection, video_path, self.score_dir),
+                "transcode": self.executor.submit(run_edit_proxy, video_path, self.transcode_dir),
+            },
+        }
+        for future in job["futures"].values():
+            future.add_done_callback(lambda _future, job=job: self._mark_finished(job))
+        self._jobs[job_id] = job
+        return self.snapshot(job_id)
+
+    def snapshot(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+
+        stages = {name: self._stage_status(future) for name, future in job["futures"].items()}
+        finished = sum(1 for status in stages.values() if status in ("completed", "failed"))
+        detect_future: Future = job["futures"]["detect"]
+
+        status = "queued"
+        if any(value != "pending" for value in stages.values()):
+            status = "running"
+        result = None
+        error = None
+        if stages["detect"] == "failed":
+            status = "failed"
+            error = str(detect_future.exception())
+        elif finished == len(self.STAGES):
+            status = "completed"
+            result = self._build_result(job)
+            if stages["transcode"] == "failed":
+                # 编辑版转码失败不影响切点结果，与 /api/analyze 一致返回空 session
+                error = str(job["futures"]["transcode"].exception())
+
+        if status in ("completed", "failed") and not job["completed_at"]:
+            job["completed_at"] = datetime.now().isoformat()
+
+        return {
+            "job_id": job_id,
+            "status": status,
+            "progress": round(finished / len(self.STAGES), 2),
+            "stages": stages,
+            "video_path": job["video_path"],
+            "created_at": job["created_at"],
+            "completed_at": job["completed_at"],
+            # 检测完成后由 result 中的正式切点替代
+            "preview": self._preview_result(job) if result is None else None,
+            "result": result,
+            "error": error,
+        }
+
+    def submit_batch(self, video_paths: List[str]) -> dict:
+        self._prune_finished()
+        batch_id = uuid.uuid4().hex[:12]
+        self._batches[batch_id] = {
+            "batch_id": batch_id,
+            "job_ids": [self.submit(path)["job_id"] for path in video_paths],
+            "created_at": datetime.now().isoformat(),
+        }
+        return self.batch_snapshot(batch_id)
+
+    def batch_snapshot(self, batch_id: str) -> Optional[dict]:
+        batch = self._batches.get(batch_id)
+        if not batch:
+            return None
+        jobs = [self.snapshot(job_id) for job_id in batch["job_ids"]]
+        completed = sum(1 for job in jobs if job["status"] == "completed")
+        failed = sum(1 for job in jobs if job["status"] == "failed")
+        return {
+            "batch_id": batch_id,
+            "status": "completed" if completed + failed == len(jobs) else "running",
+            "total": len(jobs),
+            "completed": completed,
+            "failed": failed,
+            "created_at": batch["created_at"],
+            "jobs": jobs,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._preview_executor is not None:
+            self._preview_executor.shutdown(wait=False, cancel_futures=True)
+            self._preview_executor = None
+
+    # Internal helpers ------------------------------------------------
+
+    @staticmethod
+    def _preview_result(job: dict) -> Optional[dict]:
+        future: Optional[Future] = job["preview"]
+        if future is None or not future.done() or future.cancelled():
+            return None
+        return future.result()
+
+    @staticmethod
+    def _mark_finished(job: dict) -> None:
+        # 在执行器回调线程中调用，记录所有阶段结束的时刻用于过期清理
+        if job["finished_at"] is None and all(future.done() for future in job["futures"].values()):
+            job["finished_at"] = time.monotonic()
+
+    def _prune_finished(self) -> None:
+        if self.job_ttl_seconds <= 0:
+            return
+        deadline = time.monotonic() - self.job_ttl_seconds
+
+        def expired(job_id: str) -> bool:
+            job = self._jobs.get(job_id)
+            return job is None or (job["finished_at"] is not None and job["finished_at"] < deadline)
+
+        # batch 内的 job 随 batch 一起过期，避免 batch_snapshot 引用已删除的 job
+        for batch_id, batch in list(self._batches.items()):
+            if all(expired(job_id) for job_id in batch["job_ids"]):
+                del self._batches[batch_id]
+        batched = {job_id for batch in self._batches.values() for job_id in batch["job_ids"]}
+        for job_id in [job_id for job_id in list(self._jobs) if job_id not in batched and expired(job_id)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _stage_status(future: Future) -> str:
+        if future.done():
+            return "failed" if future.cancelled() or future.exception() else "completed"
+        return "running" if future.running() else "pending"
+
+    @staticmethod
+    def _build_result(job: dict) -> dict:
+        detection = job["futures"]["detect"].result()
+        session_id = None
+        edit_url = None
+        transcode_future: Future = job["futures"]["transcode"]
+        if not transcode_future.cancelled() and transcode_future.exception() is None:
+            session = transcode_future.result()
+            session_id = session["session_id"]
+            edit_url = session["edit_url_segment"]
+        return {
+            "video_path": job["video_path"],
+            "duration": detection["duration"],
+            "cuts": detection["cuts"],
+            "session_id": session_id,
+            "edit_video_url": edit_url,
+        }
@@ -0,0 +1,129 @@
+import math
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+class _Decoder:
+    def __init__(self, capture: cv2.VideoCapture, fps: float, frame_count: int) -> None:
+        self.capture = capture
+        self.fps = fps
+        self.frame_count = frame_count
+        self.lock = threading.Lock()
+
+
+class FrameDecoderPool:
+    """
+    常驻解码器池：每个活跃 session 保持一个打开的 OpenCV VideoCapture（edit.mp4），按 LRU 淘汰。
+    编辑版每帧都是关键帧，seek 只需解码目标帧，省去每次取帧拉起 ffmpeg 进程的开销。
+    同一解码器同一时间只服务一个请求，不同 session 之间互不阻塞。
+    """
+
+    def __init__(self, max_size: int = 4, jpeg_quality: int = 90) -> None:
+        self.max_size = max(max_size, 0)
+        self.jpeg_quality = jpeg_quality
+        self._decoders: "OrderedDict[str, _Decoder]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Public API -----------------------------------------------------
+
+    def grab(
+        self,
+        session_id: str,
+        edit_path: Path,
+        timecode: float,
+        width: Optional[int] = None,
+        ext: str = ".jpg",
+        params: Optional[List[int]] = None,
+    ) -> Optional[bytes]:
+        """
+        返回 timecode 处（pts >= timecode 的第一帧，与 ffmpeg 输入前 -ss 一致）的编码字节；
+        width 小于原宽时等比缩小，ext/params 透传给 cv2.imencode（缺省为 JPEG，质量 jpeg_quality）。
+        无法解码时返回 None，由调用方退回 ffmpeg。
+        """
+        frame = self._read(session_id, edit_path, timecode)
+        if frame is None:
+            return None
+        if width and width < frame.shape[1]:
+            # 高度取偶数，与 ffmpeg scale=W:-2 一致
+            height = max(int(round(frame.shape[0] * width / frame.shape[1] / 2)) * 2, 2)
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        if params is None:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        ok, encoded = cv2.imencode(ext, frame, params)
+        return encoded.tobytes() if ok else None
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            decoder = self._decoders.pop(session_id, None)
+        if decoder is not None:
+            self._close(decoder)
+
+    def close(self) -> None:
+        with self._lock:
+            decoders = list(self._decoders.values())
+            self._decoders.clear()
+        for decoder in decoders:
+            self._close(decoder)
+
+    # Internal helpers ------------------------------------------------
+
+    def _read(self, session_id: str, edit_path: Path, timecode: float) -> Optional[np.ndarray]:
+        if self.max_size <= 0:
+            return None
+        decoder = self._acquire(session_id, edit_path)
+        if decoder is None:
+            return None
+
+        # 减去极小量，避免浮点误差把恰好落在帧时间上的请求推到下一帧
+        index = max(math.ceil(max(timecode, 0.0) * decoder.fps - 1e-6), 0)
+        if decoder.frame_count > 0:
+            index = min(index, decoder.frame_count - 1)
+        with decoder.lock:
+            if not decoder.capture.set(cv2.CAP_PROP_POS_FRAMES, index):
+                return None
+            ok, frame = decoder.capture.read()
+        return frame if ok else None
+
+    def _acquire(self, session_id: str, edit_path: Path) -> Optional[_Decoder]:
+        with self._lock:
+            decoder = self._decoders.get(session_id)
+            if decoder is not None:
+                self._decoders.move_to_end(session_id)
+                return decoder
+
+        capture = cv2.VideoCapture(str(edit_path))
+        if not capture.isOpened():
+            capture.release()
+            return None
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        if fps <= 0 or math.isnan(fps):
+            capture.release()
+            return None
+        decoder = _Decoder(capture, fps, int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0))
+
+        evicted = []
+        with self._lock:
+            existing = self._decoders.get(session_id)
+            if existing is not None:
+                # 并发打开同一 session 时保留先放入池中的解码器
+                evicted.append(decoder)
+                decoder = existing
+            else:
+                self._decoders[session_id] = decoder
+                while len(self._decoders) > self.max_size:
+                    _, oldest = self._decoders.popitem(last=False)
+                    evicted.append(oldest)
+        for item in evicted:
+            self._close(item)
+        return decoder
+
+    @staticmethod
+    def _close(decoder: _Decoder) -> None:
+        # 等待正在进行的取帧结束再释放
+        with decoder.lock:
+            decoder.capture.release()
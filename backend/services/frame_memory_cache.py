@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class FrameMemoryCache:
+    """
+    进程内已编码帧（JPEG / WebP 字节，按尺寸与格式区分）的 LRU 缓存，按总字节数限制内存占用。
+    剪辑时在同几秒内来回拖动，热点帧直接从内存返回，不再访问磁盘。
+    记录命中 / 未命中 / 淘汰次数，便于观察预算是否合适。
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024) -> None:
+        self.max_bytes = max(max_bytes, 0)
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        # 单帧超过预算时不缓存，避免把整个缓存挤空
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+                self.evicted_bytes += len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+            }
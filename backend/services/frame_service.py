@@ -1,9 +1,21 @@
-import hashlib
+import fcntl
 import json
+import math
 import os
+import shutil
 import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+
+from services.frame_decoder_pool import FrameDecoderPool
+from services.frame_memory_cache import FrameMemoryCache
+from services.media_probe import MediaProbeError, build_video_signature, media_probe
 
 
 class FrameServiceError(Exception):
@@ -14,78 +26,562 @@ class FrameService:
     """
     提供基于 ffmpeg 的帧提取能力，将源视频转码为 GOP=1 的编辑版，确保时间轴对齐。
     每个源视频会生成一个 session（按文件 path+size+mtime 生成签名，避免重复转码）。
+    编辑版档位（FRAME_PROXY_TIER）: scrub 360p / review 720p / full 源分辨率，full 之外也可按需单独生成。
+    同一 session 的转码按签名加锁（single-flight，线程锁 + 会话目录下的文件锁，分析任务的子进程同样遵守），
+    并发调用只会转码一次；start_session 在后台线程转码并立即返回，进度通过 get_transcode_status 查询，
+    其它进程中的转码进度通过会话目录下的 transcode_status.json 共享。
+    转码先逐段写出 fMP4 HLS（hls/edit.m3u8），完成后无损封装为 edit.mp4 并删除分段；
+    转码期间已完成的分段即可播放和取帧。
     """
 
+    # 编辑版编码参数：每帧都是关键帧，seek 到任意时间都无需解码前序帧；CRF 与分辨率由档位决定
+    EDIT_ENCODE_ARGS = (
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-g",
+        "1",
+        "-sc_threshold",
+        "0",
+        "-pix_fmt",
+        "yuv420p",
+    )
+
+    # 编辑版档位：height=0 表示保持源分辨率。full 之外的档位 session_id 追加 -<档位> 后缀，
+    # 各档位的帧缓存、雪碧图互不混用
+    PROXY_TIERS = {
+        "scrub": {"height": 360, "crf": 23},
+        "review": {"height": 720, "crf": 18},
+        "full": {"height": 0, "crf": 15},
+    }
+
+    TRANSCODE_LOCK_NAME = ".transcode.lock"
+    TRANSCODE_STATUS_NAME = "transcode_status.json"
+
+    HLS_DIR_NAME = "hls"
+    HLS_PLAYLIST_NAME = "edit.m3u8"
+    HLS_MEDIA_TYPES = {
+        ".m3u8": "application/vnd.apple.mpegurl",
+        ".m4s": "video/iso.segment",
+        ".mp4": "video/mp4",
+    }
+
+    # 单次 ffmpeg 调用最多打开的输入数，避免命令行过长
+    MAX_FRAMES_PER_CALL = 32
+
+    # 单帧输出格式：格式名 -> (扩展名, MIME)
+    FRAME_FORMATS = {
+        "jpeg": (".jpg", "image/jpeg"),
+        "webp": (".webp", "image/webp"),
+    }
+    DEFAULT_WEBP_QUALITY = 80
+
     def __init__(self, base_dir: str = "transcodes", ffmpeg_bin: str = "ffmpeg") -> None:
         self.base_dir = Path(base_dir).resolve()
         self.ffmpeg_bin = ffmpeg_bin
+        # 雪碧图金字塔：每级一个采样间隔（秒），由密到疏对应时间轴由近到远的缩放
+        self.sprite_intervals = [
+            float(value) for value in os.getenv("FRAME_SPRITE_INTERVALS", "0.25,1,4").split(",") if value.strip()
+        ]
+        self.sprite_height = int(os.getenv("FRAME_SPRITE_HEIGHT", "90"))
+        self.sprite_columns = int(os.getenv("FRAME_SPRITE_COLUMNS", "10"))
+        self.sprite_rows = int(os.getenv("FRAME_SPRITE_ROWS", "10"))
+        # 常驻解码器数量，0 表示每次取帧都调用 ffmpeg
+        self.decoder_pool = FrameDecoderPool(int(os.getenv("FRAME_DECODER_POOL_SIZE", "4")))
+        self.memory_cache = FrameMemoryCache(int(float(os.getenv("FRAME_MEMORY_CACHE_MB", "128")) * 1024 * 1024))
+        self.proxy_tier = os.getenv("FRAME_PROXY_TIER", "full").strip().lower()
+        if self.proxy_tier not in self.PROXY_TIERS:
+            self.proxy_tier = "full"
+        self.transcode_workers = max(int(os.getenv("FRAME_TRANSCODE_WORKERS", "2")), 1)
+        self.hls_segment_seconds = float(os.getenv("FRAME_HLS_SEGMENT_SECONDS", "2"))
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self._transcode_status: Dict[str, dict] = {}
+        self._state_lock = threading.Lock()
 
     # Public API -----------------------------------------------------
-    def ensure_session(self, video_path: str, duration: Optional[float] = None) -> dict:
+    def ensure_session(
+        self,
+        video_path: str,
+        duration: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> dict:
         """
         返回 {session_id, edit_path, edit_url_segment, duration}
-        如不存在则转码生成，已存在则复用。
+        如不存在则转码生成，已存在则复用；同一 session 正在转码时等待其完成。
+        tier 缺省使用 FRAME_PROXY_TIER。
         """
-        source = Path(video_path).resolve()
-        if not source.exists():
-            raise FrameServiceError(f"视频不存在: {video_path}")
-
-        signature = self._build_signature(source)
-        session_id = self._load_or_create_session(signature)
-        session_dir = self.base_dir / session_id
+        tier = self._resolve_tier(tier)
+        source, session_dir = self._prepare_session(video_path, duration, tier)
+        session_id = session_dir.name
         edit_path = session_dir / "edit.mp4"
-        frames_dir = session_dir / "frames"
+        if not duration:
+            # 转码超时与进度都依赖时长，按需生成档位等调用方不一定提供
+            duration = self._probe_duration(source) or None
+
+        with self.session_lock(session_id):
+            if not edit_path.exists():
+                self._set_status(session_id, "running", 0.0)
+                try:
+                    self._transcode(
+                        source,
+                        edit_path,
+                        duration,
+                        on_progress=lambda percent: self._set_status(session_id, "running", percent),
+                        tier=tier,
+                    )
+                except FrameServiceError as exc:
+                    self._set_status(session_id, "failed", 0.0, str(exc))
+                    raise
+            self._set_status(session_id, "ready", 1.0)
+
+        return self._session_info(session_id, duration)
+
+    def start_session(
+        self,
+        video_path: str,
+        duration: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> dict:
+        """
+        不阻塞的 ensure_session：立即返回 session 信息及 transcode_status，编辑版缺失时在后台转码。
+        编辑版就绪前取帧接口改从已完成的分段或源视频取帧（较慢但结果一致），前端无需等待。
+        """
+        tier = self._resolve_tier(tier)
+        _, session_dir = self._prepare_session(video_path, duration, tier)
+        session_id = session_dir.name
+        with self._state_lock:
+            status = self._status_locked(session_id)
+            if status["status"] in ("ready", "pending", "running"):
+                return {
+                    **self._session_info(session_id, duration, transcoding=status["status"] != "ready"),
+                    "transcode_status": status["status"],
+                }
+            self._transcode_status[session_id] = {"status": "pending", "percent": 0.0, "error": None}
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.transcode_workers)
+            executor = self._executor
+
+        future = executor.submit(self.ensure_session, video_path, duration, tier)
+        # 失败信息已记录在状态中，这里只取走异常避免未处理告警
+        future.add_done_callback(lambda done: done.exception())
+        return {**self._session_info(session_id, duration, transcoding=True), "transcode_status": "pending"}
+
+    def get_transcode_status(self, session_id: str) -> dict:
+        """返回 {session_id, status: pending/running/ready/failed, percent, error}"""
+        if not (self.base_dir / session_id).is_dir():
+            raise FrameServiceError("会话不存在")
+        with self._state_lock:
+            return {"session_id": session_id, **self._status_locked(session_id)}
+
+    def mark_ready(self, session_id: str) -> None:
+        """外部写入方（如融合导入）生成 edit.mp4 后记录就绪状态；调用方需持有 session_lock。"""
+        self._set_status(session_id, "ready", 1.0)
+
+    @contextmanager
+    def session_lock(self, session_id: str) -> Iterator[None]:
+        """同一 session 的编辑版写入互斥（转码、融合导入等），跨进程同样生效。"""
+        with self._state_lock:
+            lock = self._session_locks.setdefault(session_id, threading.Lock())
+        with lock, open(self.base_dir / session_id / self.TRANSCODE_LOCK_NAME, "a") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.decoder_pool.close()
+
+    def session_dir_for(self, video_path: str | Path, tier: Optional[str] = None) -> Path:
+        """返回（必要时创建）源视频在指定档位下的 session 目录，不触发转码。"""
+        signature = self._build_signature(Path(video_path).resolve())
+        tier = self._resolve_tier(tier)
+        if tier != "full":
+            signature = f"{signature}-{tier}"
+        return self.base_dir / self._load_or_create_session(signature)
+
+    def edit_encode_args(self, tier: Optional[str] = None, faststart: bool = False) -> List[str]:
+        """编辑版编码参数；直接写出 mp4（而非先写 HLS 再封装）时传 faststart=True，把 moov 前置便于边下边播。"""
+        args = [*self.EDIT_ENCODE_ARGS, "-crf", str(self.PROXY_TIERS[self._resolve_tier(tier)]["crf"])]
+        if faststart:
+            args.extend(["-movflags", "+faststart"])
+        return args
+
+    def proxy_filter(self, tier: Optional[str] = None) -> Optional[str]:
+        """档位对应的缩放滤镜；保持源分辨率时返回 None。只缩小不放大，宽度保持偶数。"""
+        height = self.PROXY_TIERS[self._resolve_tier(tier)]["height"]
+        if not height:
+            return None
+        return f"scale=-2:'min({height},ih)'"
+
+    def get_frame(
+        self,
+        session_id: str,
+        timecode: float,
+        width: Optional[int] = None,
+        quality: Optional[int] = None,
+        fmt: str = "jpeg",
+    ) -> Path:
+        """
+        返回 timecode 处的帧文件。width（只缩小不放大）/ quality（1-100）/ fmt（jpeg、webp）
+        生成的变体与原尺寸 JPEG 分开缓存在 frames/ 下；全部缺省时即原尺寸 JPEG。
+        """
+        width, quality, fmt = self._frame_variant(width, quality, fmt)
+        self._require_frame_source(session_id)
+        frames_dir = self.base_dir / session_id / "frames"
         frames_dir.mkdir(parents=True, exist_ok=True)
+        frame_path = frames_dir / self._frame_filename(timecode, width, quality, fmt)
+        if frame_path.exists():
+            return frame_path
+
+        # 转码中的 HLS 仍在增长，不放入常驻解码器池
+        data = None
+        edit_path = self.base_dir / session_id / "edit.mp4"
+        if edit_path.exists():
+            data = self.decoder_pool.grab(
+                session_id,
+                edit_path,
+                timecode,
+                width=width,
+                ext=self.FRAME_FORMATS[fmt][0],
+                params=self._imencode_params(quality, fmt),
+            )
+        if data is None:
+            source, seek, prefilter = self._frame_input(session_id, timecode)
+            self._extract_frame(source, frame_path, seek, width, quality, fmt, prefilter)
+        else:
+            self._write_frame(frame_path, data)
+        return frame_path
+
+    def get_frame_bytes(
+        self,
+        session_id: str,
+        timecode: float,
+        width: Optional[int] = None,
+        quality: Optional[int] = None,
+        fmt: str = "jpeg",
+    ) -> bytes:
+        """与 get_frame 相同的帧，优先从内存缓存返回编码字节，命中时不访问磁盘。"""
+        width, quality, fmt = self._frame_variant(width, quality, fmt)
+        key = (session_id, self._frame_key(timecode), width, quality, fmt)
+        data = self.memory_cache.get(key)
+        if data is None:
+            data = self.get_frame(session_id, timecode, width, quality, fmt).read_bytes()
+            self.memory_cache.put(key, data)
+        return data
 
+    @classmethod
+    def frame_media_type(cls, fmt: str) -> str:
+        return cls.FRAME_FORMATS[cls._frame_variant(None, None, fmt)[2]][1]
+
+    @classmethod
+    def frame_etag(
+        cls,
+        session_id: str,
+        timecode: float,
+        width: Optional[int] = None,
+        quality: Optional[int] = None,
+        fmt: str = "jpeg",
+    ) -> str:
+        """session_id 即源视频签名，同一参数组合的帧内容不会变化，ETag 直接由参数得出。"""
+        width, quality, fmt = cls._frame_variant(width, quality, fmt)
+        return f'"{session_id}-{cls._frame_filename(timecode, width, quality, fmt)}"'
+
+    def get_frames(self, session_id: str, timecodes: List[float]) -> List[Path]:
+        """
+        批量取帧，返回与 timecodes 一一对应的帧文件。
+        未缓存的帧在同一个 ffmpeg 进程中按各自 -ss 依次 seek 提取，结果与 get_frame 完全一致。
+        """
+        self._require_frame_source(session_id)
+        frames_dir = self.base_dir / session_id / "frames"
+        frames_dir.mkdir(parents=True, exist_ok=True)
+
+        paths = [frames_dir / self._frame_filename(timecode) for timecode in timecodes]
+        missing: dict[Path, float] = {}
+        for timecode, path in zip(timecodes, paths):
+            if not path.exists():
+                missing.setdefault(path, timecode)
+
+        pending = [(path, *self._frame_input(session_id, timecode)) for path, timecode in missing.items()]
+        for offset in range(0, len(pending), self.MAX_FRAMES_PER_CALL):
+            self._extract_frames(pending[offset:offset + self.MAX_FRAMES_PER_CALL])
+        return paths
+
+    def get_frame_neighborhood(
+        self,
+        session_id: str,
+        timecode: float,
+        radius: int = 1,
+        step: int = 1,
+    ) -> List[Tuple[float, Path]]:
+        """
+        以 timecode 所在帧为中心，前后各取 radius 帧（间隔 step 帧），按时间升序返回 [(时间, 帧文件)]。
+        时间按编辑版帧率对齐到帧网格；缺失的帧一次 seek 后顺序解码得到。
+        """
+        self._require_frame_source(session_id)
+        fps, frame_count = self._frame_grid(session_id)
+        center = int(round(max(timecode, 0.0) * fps))
+        if frame_count:
+            center = min(center, frame_count - 1)
+        step = max(step, 1)
+        indices = sorted({
+            idx
+            for idx in (center + offset * step for offset in range(-radius, radius + 1))
+            if idx >= 0 and (not frame_count or idx < frame_count)
+        })
+
+        frames_dir = self.base_dir / session_id / "frames"
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        # 毫秒向下取整：t 落在 (idx-1, idx] 帧之间，按 pts >= t 的第一帧规则读取时仍是第 idx 帧
+        times = [int(idx * 1000 / fps) / 1000 for idx in indices]
+        frames = [(t, frames_dir / self._frame_filename(t)) for t in times]
+        if any(not path.exists() for _, path in frames):
+            # 从首帧前半帧处 seek，避免浮点误差跳过首帧
+            source, seek, prefilter = self._frame_input(session_id, (indices[0] - 0.5) / fps, indices[-1] / fps)
+            self._extract_frame_run(source, seek, frames_dir, indices, [path for _, path in frames], prefilter)
+        return frames
+
+    def get_fps(self, session_id: str) -> float:
+        fps, _ = self._frame_grid(session_id)
+        return fps
+
+    def ensure_sprites(self, session_id: str) -> dict:
+        """
+        生成（或复用）时间轴雪碧图金字塔，返回索引：
+        {duration, levels: [{interval, columns, rows, tile_width, tile_height, count, sheets}]}
+        第 i 张缩略图对应时间 i * interval，位于 sheets[i // (columns*rows)]，
+        格内位置 p = i % (columns*rows)，坐标 ((p % columns) * tile_width, (p // columns) * tile_height)。
+        所有层级共用一次解码，文件位于 session 目录的 sprites/ 下。
+        生成过程持有 session_lock，并发请求（含其它进程）等待后直接复用同一份结果。
+        """
+        edit_path = self.get_edit_video_path(session_id)
+        sprites_dir = self.base_dir / session_id / "sprites"
+        index_path = sprites_dir / "index.json"
+        index = self._read_sprite_index(index_path)
+        if index is not None:
+            return index
+
+        with self.session_lock(session_id):
+            # 等锁期间其它请求可能已生成完毕
+            index = self._read_sprite_index(index_path)
+            if index is not None:
+                return index
+            return self._build_sprites(edit_path, sprites_dir, index_path)
+
+    def get_sprite_path(self, session_id: str, name: str) -> Path:
+        path = self.base_dir / session_id / "sprites" / Path(name).name
+        if path.suffix != ".jpg" or not path.is_file():
+            raise FrameServiceError("雪碧图不存在")
+        return path
+
+    def get_source_path(self, session_id: str) -> Path:
+        source = Path(self._read_meta(session_id).get("source") or "")
+        if not source.is_file():
+            raise FrameServiceError(f"源视频不存在: {source}")
+        return source
+
+    def get_hls_path(self, session_id: str, name: str) -> Path:
+        """HLS 播放列表、初始化段或媒体分段；转码期间播放列表只列出已完成的分段。"""
+        path = self.base_dir / session_id / self.HLS_DIR_NAME / Path(name).name
+        if path.suffix not in self.HLS_MEDIA_TYPES or not path.is_file():
+            raise FrameServiceError("HLS 文件不存在")
+        return path
+
+    def iter_partial_video(self, session_id: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        编辑版尚未封装完成时，按初始化段 + 已完成分段的顺序拼出可渐进播放的 fMP4 字节流。
+        只读取调用时播放列表中已列出的分段。
+        """
+        hls_dir = self.base_dir / session_id / self.HLS_DIR_NAME
+        segments = self._hls_segments(hls_dir)
+        if not segments:
+            raise FrameServiceError("编辑版视频未就绪")
+        for path in [hls_dir / "init.mp4", *segments]:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                # 读取过程中转码完成、分段已删除，到此为止，客户端重新请求即得到 edit.mp4
+                return
+            with f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+    def get_edit_video_path(self, session_id: str) -> Path:
+        session_dir = self.base_dir / session_id
+        edit_path = session_dir / "edit.mp4"
         if not edit_path.exists():
-            self._transcode(source, edit_path, duration)
+            raise FrameServiceError("编辑版视频未就绪")
+        return edit_path
+
+    # Internal helpers ------------------------------------------------
+    def _resolve_tier(self, tier: Optional[str]) -> str:
+        tier = (tier or self.proxy_tier).strip().lower()
+        if tier not in self.PROXY_TIERS:
+            raise FrameServiceError(f"未知的编辑版档位: {tier}")
+        return tier
+
+    def _prepare_session(self, video_path: str, duration: Optional[float], tier: str) -> Tuple[Path, Path]:
+        source = Path(video_path).resolve()
+        if not source.exists():
+            raise FrameServiceError(f"视频不存在: {video_path}")
+        session_dir = self.session_dir_for(source, tier)
+        (session_dir / "frames").mkdir(parents=True, exist_ok=True)
 
         # 记录 metadata 方便下次复用
         meta_path = session_dir / "meta.json"
         if not meta_path.exists():
             meta = {
                 "source": str(source),
-                "signature": signature,
+                "signature": self._build_signature(source),
+                "tier": tier,
                 "duration": duration,
             }
             meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return source, session_dir
 
-        actual_duration = duration or self._probe_duration(edit_path)
-        return {
+    def _session_info(self, session_id: str, duration: Optional[float], transcoding: bool = False) -> dict:
+        info = {
             "session_id": session_id,
-            "edit_path": str(edit_path),
+            "edit_path": str(self.base_dir / session_id / "edit.mp4"),
             "edit_url_segment": f"/api/transcode/video/{session_id}",
-            "duration": actual_duration,
+            "duration": duration,
         }
+        # HLS 分段只在转码期间存在，封装为 edit.mp4 后即删除
+        if transcoding:
+            info["hls_url_segment"] = f"/api/transcode/hls/{session_id}/{self.HLS_PLAYLIST_NAME}"
+        return info
 
-    def get_frame(self, session_id: str, timecode: float) -> Path:
+    def _require_frame_source(self, session_id: str) -> None:
+        """取帧需要 edit.mp4、转码中已完成的 HLS 分段，或（兜底）仍然存在的源视频。"""
         session_dir = self.base_dir / session_id
-        edit_path = session_dir / "edit.mp4"
-        if not edit_path.exists():
+        if (session_dir / "edit.mp4").exists() or self._hls_segments(session_dir / self.HLS_DIR_NAME):
+            return
+        if not Path(self._read_meta(session_id).get("source") or "").is_file():
             raise FrameServiceError("编辑版视频未就绪")
 
-        frames_dir = session_dir / "frames"
-        frames_dir.mkdir(parents=True, exist_ok=True)
-        frame_path = frames_dir / self._frame_filename(timecode)
-        if frame_path.exists():
-            return frame_path
-
-        self._extract_frame(edit_path, frame_path, timecode)
-        return frame_path
+    def _read_meta(self, session_id: str) -> dict:
+        meta_path = self.base_dir / session_id / "meta.json"
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as exc:
+            raise FrameServiceError("会话不存在") from exc
 
-    def get_edit_video_path(self, session_id: str) -> Path:
+    def _frame_input(
+        self,
+        session_id: str,
+        timecode: float,
+        end: Optional[float] = None,
+    ) -> Tuple[str, float, Optional[str]]:
+        """
+        取帧的 ffmpeg 输入、输入前 -ss 时间与需前置的滤镜：编辑版就绪时为 edit.mp4 与 timecode 本身。
+        转码中的 event 播放列表没有 EXT-X-ENDLIST，ffmpeg 按直播流读取（不能 seek，从末尾几段开始），
+        因此按帧网格直接定位分段（GOP=1，第 k 段从第 ceil(k * 分段时长 * fps) 帧开始），
+        用 concat 协议拼接 init.mp4 与覆盖 [timecode, end] 的分段，-ss 为相对分段起点的时间。
+        覆盖该时间的分段尚未生成时退回源视频（需从关键帧解码，较慢），并套用档位缩放滤镜与编辑版保持同尺寸。
+        """
+        self._require_frame_source(session_id)
         session_dir = self.base_dir / session_id
         edit_path = session_dir / "edit.mp4"
-        if not edit_path.exists():
-            raise FrameServiceError("编辑版视频未就绪")
-        return edit_path
+        if edit_path.exists():
+            return str(edit_path), timecode, None
+        hls_dir = session_dir / self.HLS_DIR_NAME
+        segments = self._hls_segments(hls_dir)
+        if not segments:
+            return self._source_frame_input(session_id, timecode)
+
+        fps, _ = self._frame_grid(session_id)
+        frames_per_segment = max(self.hls_segment_seconds * fps, 1.0)
+
+        def segment_start(index: int) -> int:
+            return math.ceil(index * frames_per_segment - 1e-6)
+
+        def locate(t: float) -> Tuple[int, int]:
+            # 与 ffmpeg 输入前 -ss 一致：pts >= t 的第一帧
+            frame = max(math.ceil(max(t, 0.0) * fps - 1e-6), 0)
+            index = int(frame // frames_per_segment)
+            while index > 0 and segment_start(index) > frame:
+                index -= 1
+            while segment_start(index + 1) <= frame:
+                index += 1
+            return frame, index
+
+        frame, first = locate(timecode)
+        _, last = locate(timecode if end is None else end)
+        if last >= len(segments):
+            return self._source_frame_input(session_id, timecode)
+        parts = [hls_dir / "init.mp4", *segments[first:last + 1]]
+        # 退半帧，避免浮点误差跳过目标帧
+        return "concat:" + "|".join(str(path) for path in parts), (frame - segment_start(first) - 0.5) / fps, None
+
+    def _source_frame_input(self, session_id: str, timecode: float) -> Tuple[str, float, Optional[str]]:
+        meta = self._read_meta(session_id)
+        return str(self.get_source_path(session_id)), timecode, self.proxy_filter(meta.get("tier"))
+
+    @staticmethod
+    def _hls_segments(hls_dir: Path) -> List[Path]:
+        try:
+            playlist = (hls_dir / FrameService.HLS_PLAYLIST_NAME).read_text(encoding="utf-8")
+        except OSError:
+            return []
+        if not (hls_dir / "init.mp4").exists():
+            return []
+        return [hls_dir / line.strip() for line in playlist.splitlines() if line.strip() and not line.startswith("#")]
+
+    def _set_status(self, session_id: str, status: str, percent: float, error: Optional[str] = None) -> None:
+        entry = {"status": status, "percent": round(percent, 4), "error": error}
+        with self._state_lock:
+            self._transcode_status[session_id] = entry
+        # 只在持有 session_lock 时调用，同一时间只有一个写入方
+        status_path = self.base_dir / session_id / self.TRANSCODE_STATUS_NAME
+        tmp_path = status_path.with_name(f".{status_path.name}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+            os.replace(tmp_path, status_path)
+        except OSError:
+            pass
+
+    def _status_locked(self, session_id: str) -> dict:
+        status = self._transcode_status.get(session_id)
+        if status is not None and status["status"] in ("running", "failed"):
+            return dict(status)
+        # 其它进程（或上次运行）生成的编辑版同样视为就绪
+        if (self.base_dir / session_id / "edit.mp4").exists():
+            return {"status": "ready", "percent": 1.0, "error": None}
+        shared = self._shared_status(session_id)
+        # 本进程刚排队（pending）时，忽略此前遗留的失败状态
+        if shared is not None and (shared["status"] == "running" or status is None):
+            return shared
+        return dict(status) if status else {"status": "missing", "percent": 0.0, "error": None}
+
+    def _shared_status(self, session_id: str) -> Optional[dict]:
+        """其它进程（分析任务子进程）记录的转码状态；进程退出后遗留的 running 视为无效。"""
+        session_dir = self.base_dir / session_id
+        try:
+            status = json.loads((session_dir / self.TRANSCODE_STATUS_NAME).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if status.get("status") == "failed":
+            return status
+        if status.get("status") != "running":
+            return None
+        try:
+            with open(session_dir / self.TRANSCODE_LOCK_NAME, "a") as handle:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        except BlockingIOError:
+            return status
+        except OSError:
+            return None
+        return None
 
-    # Internal helpers ------------------------------------------------
     def _build_signature(self, source: Path) -> str:
-        stat = source.stat()
-        base = f"{source.resolve()}|{stat.st_size}|{stat.st_mtime}"
-        return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
+        return build_video_signature(source)
 
     def _load_or_create_session(self, signature: str) -> str:
         # signature 直接作为 session_id，若目录存在则复用
@@ -95,53 +591,199 @@ class FrameService:
             session_dir.mkdir(parents=True, exist_ok=True)
         return session_id
 
-    def _transcode(self, source: Path, target: Path, duration: Optional[float]) -> None:
+    def _transcode(
+        self,
+        source: Path,
+        target: Path,
+        duration: Optional[float],
+        on_progress: Optional[Callable[[float], None]] = None,
+        tier: Optional[str] = None,
+    ) -> None:
+        """
+        先逐段写 fMP4 HLS（event 播放列表，每段完成后才追加到列表），
+        转码完成后 -c copy 封装为 edit.mp4；封装前先写临时文件，读取方不会看到半成品。
+        GOP=1 下分段可在任意帧处切开，分段时长精确。
+        """
+        hls_dir = target.parent / self.HLS_DIR_NAME
+        shutil.rmtree(hls_dir, ignore_errors=True)
+        hls_dir.mkdir(parents=True)
+        playlist = hls_dir / self.HLS_PLAYLIST_NAME
         cmd = [
             self.ffmpeg_bin,
             "-hide_banner",
             "-y",
             "-i",
             str(source),
-            "-c:v",
-            "libx264",
-            "-preset",
-            "veryfast",
-            "-crf",
-            "15",
-            "-g",
-            "1",
-            "-sc_threshold",
-            "0",
-            "-pix_fmt",
-            "yuv420p",
+            *(["-vf", self.proxy_filter(tier)] if self.proxy_filter(tier) else []),
+            *self.edit_encode_args(tier),
             "-an",
-            str(target),
+            "-progress",
+            "pipe:1",
+            "-nostats",
+            "-f",
+            "hls",
+            "-hls_time",
+            f"{self.hls_segment_seconds:g}",
+            "-hls_playlist_type",
+            "event",
+            "-hls_segment_type",
+            "fmp4",
+            "-hls_fmp4_init_filename",
+            "init.mp4",
+            "-hls_flags",
+            "independent_segments+temp_file",
+            "-hls_segment_filename",
+            str(hls_dir / "seg_%05d.m4s"),
+            str(playlist),
+        ]
+        timed_out = threading.Event()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(max(int((duration or 60) * 2), 60), kill_on_timeout)
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                # out_time_us 与（历史命名的）out_time_ms 单位都是微秒
+                if key in ("out_time_us", "out_time_ms") and on_progress and duration:
+                    try:
+                        on_progress(min(int(value) / 1_000_000 / duration, 0.99))
+                    except ValueError:
+                        continue
+            process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        if timed_out.is_set() or process.returncode != 0:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+            reason = "超时" if timed_out.is_set() else f"ffmpeg 退出码 {process.returncode}"
+            raise FrameServiceError(f"转码失败: {reason}")
+
+        partial = target.with_name(f"{target.stem}.transcoding{target.suffix}")
+        remux_cmd = [
+            self.ffmpeg_bin,
+            "-hide_banner",
+            "-y",
+            "-i",
+            str(playlist),
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            str(partial),
         ]
-        timeout = max(int((duration or 60) * 2), 60)
+        try:
+            subprocess.run(remux_cmd, check=True, capture_output=True, timeout=max(int(duration or 60), 60))
+        except subprocess.SubprocessError as exc:
+            if partial.exists():
+                partial.unlink()
+            raise FrameServiceError(f"转码失败: {exc}") from exc
+        os.replace(partial, target)
+        # 分段与 edit.mp4 内容相同，保留会使磁盘占用翻倍
+        shutil.rmtree(hls_dir, ignore_errors=True)
+
+    def _extract_frame(
+        self,
+        source: str,
+        output: Path,
+        timecode: float,
+        width: Optional[int] = None,
+        quality: Optional[int] = None,
+        fmt: str = "jpeg",
+        prefilter: Optional[str] = None,
+    ) -> None:
+        cmd = [self.ffmpeg_bin, "-hide_banner", "-ss", f"{max(timecode, 0.0):.3f}", "-i", source]
+        filters = [f for f in (prefilter, f"scale='min({width},iw)':-2" if width else None) if f]
+        if filters:
+            cmd.extend(["-vf", ",".join(filters)])
+        cmd.extend(["-frames:v", "1"])
+        if fmt == "webp":
+            cmd.extend(["-c:v", "libwebp", "-quality", str(quality or self.DEFAULT_WEBP_QUALITY)])
+        else:
+            # JPEG 质量 1-100 线性映射到 qscale 31-2，缺省沿用 -q:v 4
+            qscale = 4 if quality is None else max(2, min(31, round(31 - quality * 0.29)))
+            cmd.extend(["-q:v", str(qscale)])
+        cmd.extend(["-y", str(output)])
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, timeout=30)
+        except subprocess.SubprocessError as exc:
+            if output.exists():
+                output.unlink()
+            raise FrameServiceError(f"帧提取失败: {exc}") from exc
+        if not output.exists():
+            raise FrameServiceError("帧文件缺失")
+
+    @staticmethod
+    def _write_frame(output: Path, data: bytes) -> None:
+        tmp_path = output.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, output)
+
+    def _extract_frames(self, targets: List[Tuple[Path, str, float, Optional[str]]]) -> None:
+        # 每个时间点作为独立输入（输入前 -ss 快速 seek），GOP=1 下每次只解码一帧
+        cmd = [self.ffmpeg_bin, "-hide_banner"]
+        for _, source, seek, _ in targets:
+            cmd.extend(["-ss", f"{max(seek, 0.0):.3f}", "-i", source])
+        for idx, (output, _, _, prefilter) in enumerate(targets):
+            cmd.extend(["-map", f"{idx}:v:0"])
+            if prefilter:
+                cmd.extend(["-vf", prefilter])
+            cmd.extend(["-frames:v", "1", "-q:v", "4", "-y", str(output)])
         try:
             subprocess.run(
                 cmd,
                 check=True,
                 capture_output=True,
-                timeout=timeout,
+                timeout=30 + 2 * len(targets),
             )
         except subprocess.SubprocessError as exc:
-            raise FrameServiceError(f"转码失败: {exc}") from exc
+            for output, *_ in targets:
+                if output.exists():
+                    output.unlink()
+            raise FrameServiceError(f"帧提取失败: {exc}") from exc
+
+        if any(not output.exists() for output, *_ in targets):
+            raise FrameServiceError("帧文件缺失")
 
-    def _extract_frame(self, source: Path, output: Path, timecode: float) -> None:
+    def _extract_frame_run(
+        self,
+        source: str,
+        start: float,
+        frames_dir: Path,
+        indices: List[int],
+        outputs: List[Path],
+        prefilter: Optional[str] = None,
+    ) -> None:
+        # 一次 seek 到 start 后顺序解码，select 按间隔保留帧
+        step = indices[1] - indices[0] if len(indices) > 1 else 1
+        select = f"select='not(mod(n\\,{step}))'"
+        work_dir = frames_dir / f".run_{uuid.uuid4().hex[:8]}"
+        work_dir.mkdir()
         cmd = [
             self.ffmpeg_bin,
             "-hide_banner",
             "-ss",
-            f"{max(timecode, 0.0):.3f}",
+            f"{max(start, 0.0):.6f}",
             "-i",
-            str(source),
+            source,
+            "-vf",
+            f"{select},{prefilter}" if prefilter else select,
+            "-vsync",
+            "0",
             "-frames:v",
-            "1",
+            str(len(indices)),
             "-q:v",
             "4",
             "-y",
-            str(output),
+            str(work_dir / "frame_%03d.jpg"),
         ]
         try:
             subprocess.run(
@@ -150,41 +792,149 @@ class FrameService:
                 capture_output=True,
                 timeout=30,
             )
+            extracted = sorted(work_dir.glob("frame_*.jpg"))
+            if len(extracted) < len(outputs):
+                raise FrameServiceError("帧文件缺失")
+            for frame_file, output in zip(extracted, outputs):
+                os.replace(frame_file, output)
         except subprocess.SubprocessError as exc:
-            if output.exists():
-                output.unlink()
             raise FrameServiceError(f"帧提取失败: {exc}") from exc
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
-        if not output.exists():
-            raise FrameServiceError("帧文件缺失")
+    @staticmethod
+    def _read_sprite_index(index_path: Path) -> Optional[dict]:
+        if not index_path.exists():
+            return None
+        try:
+            return json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
 
-    def _probe_duration(self, source: Path) -> float:
+    def _build_sprites(self, edit_path: Path, sprites_dir: Path, index_path: Path) -> dict:
+        sprites_dir.mkdir(parents=True, exist_ok=True)
+        duration = self._probe_duration(edit_path)
+        self._render_sprites(edit_path, sprites_dir, duration)
+
+        per_sheet = self.sprite_columns * self.sprite_rows
+        levels = []
+        for level, interval in enumerate(self.sprite_intervals):
+            sheets = sorted(path.name for path in sprites_dir.glob(f"L{level}_*.jpg"))
+            if not sheets:
+                raise FrameServiceError("雪碧图文件缺失")
+            tile_width, tile_height = self._tile_size(sprites_dir / sheets[0])
+            levels.append({
+                "interval": interval,
+                "columns": self.sprite_columns,
+                "rows": self.sprite_rows,
+                "tile_width": tile_width,
+                "tile_height": tile_height,
+                "count": min(max(math.ceil(duration / interval), 1), len(sheets) * per_sheet),
+                "sheets": sheets,
+            })
+
+        index = {"duration": duration, "levels": levels}
+        tmp_path = sprites_dir / "index.json.tmp"
+        tmp_path.write_text(json.dumps(index), encoding="utf-8")
+        # index.json 最后写入，作为雪碧图完整可用的标记
+        os.replace(tmp_path, index_path)
+        return index
+
+    def _render_sprites(self, source: Path, sprites_dir: Path, duration: float) -> None:
+        count = len(self.sprite_intervals)
+        graph = [f"[0:v]split={count}" + "".join(f"[s{level}]" for level in range(count))]
+        outputs: List[str] = []
+        for level, interval in enumerate(self.sprite_intervals):
+            graph.append(
+                f"[s{level}]fps=1/{interval:g},scale=-2:{self.sprite_height},"
+                f"tile={self.sprite_columns}x{self.sprite_rows}[t{level}]"
+            )
+            outputs.extend(["-map", f"[t{level}]", "-q:v", "5", str(sprites_dir / f"L{level}_%03d.jpg")])
         cmd = [
             self.ffmpeg_bin,
             "-hide_banner",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
+            "-y",
+            "-i",
             str(source),
+            "-filter_complex",
+            ";".join(graph),
+            *outputs,
         ]
         try:
-            result = subprocess.run(
+            subprocess.run(
                 cmd,
-                capture_output=True,
-                text=True,
                 check=True,
-                timeout=20,
+                capture_output=True,
+                timeout=max(int((duration or 60) * 2), 60),
             )
-            return float(result.stdout.strip() or 0) or 0.0
-        except subprocess.SubprocessError:
-            return 0.0
-        except ValueError:
+        except subprocess.SubprocessError as exc:
+            raise FrameServiceError(f"雪碧图生成失败: {exc}") from exc
+
+    def _tile_size(self, sheet_path: Path) -> Tuple[int, int]:
+        image = cv2.imread(str(sheet_path))
+        if image is None:
+            raise FrameServiceError("雪碧图无法读取")
+        height, width = image.shape[:2]
+        return width // self.sprite_columns, height // self.sprite_rows
+
+    def _frame_grid(self, session_id: str) -> Tuple[float, Optional[int]]:
+        # 编辑版不改变帧率，转码未完成时按源视频元数据计算帧网格
+        edit_path = self.base_dir / session_id / "edit.mp4"
+        probe_path = edit_path if edit_path.exists() else self.get_source_path(session_id)
+        try:
+            info = media_probe.probe(str(probe_path))
+        except MediaProbeError as exc:
+            raise FrameServiceError("无法读取编辑版元数据") from exc
+        fps = info["fps"]
+        frame_count = info.get("frame_count") or (int(info["duration"] * fps) if info["duration"] else None)
+        return fps, frame_count
+
+    def _probe_duration(self, source: Path) -> float:
+        try:
+            return media_probe.get_duration(str(source))
+        except MediaProbeError:
             return 0.0
 
     @staticmethod
-    def _frame_filename(timecode: float) -> str:
-        milliseconds = int(round(max(timecode, 0.0) * 1000))
-        return f"frame_{milliseconds:08d}.jpg"
+    def _frame_key(timecode: float) -> int:
+        return int(round(max(timecode, 0.0) * 1000))
+
+    @classmethod
+    def _frame_filename(
+        cls,
+        timecode: float,
+        width: Optional[int] = None,
+        quality: Optional[int] = None,
+        fmt: str = "jpeg",
+    ) -> str:
+        name = f"frame_{cls._frame_key(timecode):08d}"
+        if width:
+            name += f"_w{width}"
+        if quality is not None:
+            name += f"_q{quality}"
+        return name + cls.FRAME_FORMATS[fmt][0]
+
+    @classmethod
+    def _frame_variant(
+        cls,
+        width: Optional[int],
+        quality: Optional[int],
+        fmt: Optional[str],
+    ) -> Tuple[Optional[int], Optional[int], str]:
+        fmt = (fmt or "jpeg").lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in cls.FRAME_FORMATS:
+            raise FrameServiceError(f"不支持的帧格式: {fmt}")
+        if width is not None and width <= 0:
+            raise FrameServiceError("width 必须为正整数")
+        if quality is not None and not 1 <= quality <= 100:
+            raise FrameServiceError("quality 需在 1-100 之间")
+        return width or None, quality, fmt
+
+    @classmethod
+    def _imencode_params(cls, quality: Optional[int], fmt: str) -> Optional[List[int]]:
+        if fmt == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, quality or cls.DEFAULT_WEBP_QUALITY]
+        # 缺省交给解码器池的默认 JPEG 质量
+        return None if quality is None else [cv2.IMWRITE_JPEG_QUALITY, quality]
@@ -0,0 +1,219 @@
+import json
+import os
+import subprocess
+import threading
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from services.frame_service import FrameService
+from services.media_probe import MediaProbeError, build_video_signature, media_probe
+from services.scene_detector import SceneDetector
+from services.scene_score_cache import SceneScoreCache
+
+
+class IngestPipelineError(Exception):
+    """Raised when the fused ingest run fails."""
+
+
+class IngestPipeline:
+    """
+    融合导入：源视频只解码一次，用 split 把同一路画面分给多个输出：
+    - GOP=1 编辑版 edit.mp4（与 FrameService 转码参数一致，已存在时跳过）
+    - 逐帧 scene 分数（metadata 打印到 stdout，写入 SceneScoreCache）
+    - 缩略图条带（每 INGEST_THUMB_INTERVAL 秒一张，存放在 session 的 thumbnails/ 下）
+    - 音频峰值（低采样率单声道 PCM，按桶取绝对值最大，写入 ingest.json）
+    各产物落在原有位置，之后 ensure_session / 调阈值 / 取缩略图都直接复用，不再解码。
+    """
+
+    AUDIO_SAMPLE_RATE = 8000
+    MANIFEST_NAME = "ingest.json"
+
+    def __init__(
+        self,
+        frame_service: FrameService,
+        score_cache: SceneScoreCache,
+        ffmpeg_bin: Optional[str] = None,
+    ) -> None:
+        self.frame_service = frame_service
+        self.score_cache = score_cache
+        self.ffmpeg_bin = ffmpeg_bin or os.getenv("FFMPEG_BIN", "ffmpeg")
+        self.thumbnail_interval = float(os.getenv("INGEST_THUMB_INTERVAL", "1.0"))
+        self.thumbnail_height = int(os.getenv("INGEST_THUMB_HEIGHT", "90"))
+        self.peaks_per_second = int(os.getenv("INGEST_PEAKS_PER_SECOND", "50"))
+
+    # Public API -----------------------------------------------------
+
+    def ingest(self, video_path: str) -> dict:
+        """
+        返回 {duration, cuts, session, manifest}，cuts 与 SceneDetector.detect_from_scores 规则一致。
+        cuts 不含补齐的首尾边界，由调用方按接口格式处理。
+        """
+        try:
+            info = media_probe.probe(video_path)
+        except MediaProbeError as exc:
+            raise IngestPipelineError("无法读取视频元数据") from exc
+        duration, fps = info["duration"], info["fps"]
+
+        detector = SceneDetector(score_cache=self.score_cache)
+        if detector.detect_backend != "ffmpeg":
+            raise IngestPipelineError("融合导入仅支持 ffmpeg 检测后端")
+
+        session_dir = self.frame_service.session_dir_for(video_path)
+        edit_path = session_dir / "edit.mp4"
+        partial_edit = session_dir / "edit.partial.mp4"
+        thumbs_dir = session_dir / "thumbnails"
+        thumbs_dir.mkdir(parents=True, exist_ok=True)
+        audio_path = session_dir / "audio.pcm" if info.get("has_audio") else None
+
+        # 与 FrameService 转码互斥，同一 session 的编辑版只生成一次
+        with self.frame_service.session_lock(session_dir.name):
+            cmd = self._build_cmd(
+                video_path,
+                detector.score_filter(),
+                None if edit_path.exists() else partial_edit,
+                thumbs_dir,
+                audio_path,
+            )
+            try:
+                times, scores = self._run(cmd, detector, duration)
+                if partial_edit.exists():
+                    os.replace(partial_edit, edit_path)
+                    self.frame_service.mark_ready(session_dir.name)
+                peaks = self._compute_peaks(audio_path) if audio_path else []
+            finally:
+                for leftover in (partial_edit, audio_path):
+                    if leftover is not None and leftover.exists():
+                        leftover.unlink()
+
+        if times.size:
+            key = detector.score_cache_key(build_video_signature(video_path))
+            self.score_cache.save(key, times, scores, duration, fps)
+
+        manifest = {
+            "thumbnail_interval": self.thumbnail_interval,
+            "thumbnail_count": len(list(thumbs_dir.glob("thumb_*.jpg"))),
+            "peaks_per_second": self.peaks_per_second,
+            "peaks": peaks,
+        }
+        (session_dir / self.MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+
+        session = self.frame_service.ensure_session(video_path, duration)
+        cuts = detector.detect_from_scores(times, scores, duration, fps)
+        return {"duration": duration, "cuts": cuts, "session": session, "manifest": manifest}
+
+    def load_manifest(self, session_id: str) -> Optional[dict]:
+        path = self.frame_service.base_dir / session_id / self.MANIFEST_NAME
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def get_thumbnail(self, session_id: str, index: int) -> Optional[Path]:
+        """index 从 0 开始，对应时间约为 index * thumbnail_interval。"""
+        path = self.frame_service.base_dir / session_id / "thumbnails" / f"thumb_{index + 1:05d}.jpg"
+        return path if path.is_file() else None
+
+    # Internal helpers ------------------------------------------------
+
+    def _build_cmd(
+        self,
+        video_path: str,
+        score_filter: str,
+        edit_target: Optional[Path],
+        thumbs_dir: Path,
+        audio_target: Optional[Path],
+    ) -> List[str]:
+        branches = ["scene", "thumb"] + (["edit_src"] if edit_target else [])
+        graph = [
+            f"[0:v]split={len(branches)}" + "".join(f"[{name}]" for name in branches),
+            f"[scene]{score_filter}[scores]",
+            f"[thumb]fps=1/{self.thumbnail_interval:g},scale=-2:{self.thumbnail_height}[thumbs]",
+        ]
+        if edit_target:
+            # 编辑版档位的缩放放在滤镜图内（-filter_complex 的输出不能再加 -vf）
+            graph.append(f"[edit_src]{self.frame_service.proxy_filter() or 'null'}[edit]")
+        cmd = [
+            self.ffmpeg_bin,
+            "-hide_banner",
+            "-y",
+            "-i",
+            video_path,
+            "-filter_complex",
+            ";".join(graph),
+            "-map",
+            "[scores]",
+            "-f",
+            "null",
+            "-",
+            "-map",
+            "[thumbs]",
+            "-q:v",
+            "5",
+            str(thumbs_dir / "thumb_%05d.jpg"),
+        ]
+        if edit_target:
+            cmd.extend(["-map", "[edit]", *self.frame_service.edit_encode_args(faststart=True), "-an", str(edit_target)])
+        if audio_target:
+            cmd.extend([
+                "-map",
+                "0:a:0",
+                "-ac",
+                "1",
+                "-ar",
+                str(self.AUDIO_SAMPLE_RATE),
+                "-f",
+                "s16le",
+                str(audio_target),
+            ])
+        return cmd
+
+    def _run(self, cmd: List[str], detector: SceneDetector, duration: float):
+        times = array("d")
+        scores = array("f")
+        timed_out = threading.Event()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+
+        # 编码编辑版是最慢的分支，超时与 FrameService 转码一致
+        watchdog = threading.Timer(max((duration or 60) * 2, 60), kill_on_timeout)
+        watchdog.start()
+        try:
+            for timestamp, score in detector.parse_score_lines(process.stdout):
+                times.append(timestamp)
+                scores.append(score)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise IngestPipelineError("FFmpeg 融合导入超时")
+        if process.returncode != 0:
+            raise IngestPipelineError("FFmpeg 融合导入失败")
+        return np.frombuffer(times, dtype=np.float64), np.frombuffer(scores, dtype=np.float32)
+
+    def _compute_peaks(self, audio_path: Path) -> List[float]:
+        if not audio_path.exists() or audio_path.stat().st_size < 2 or self.peaks_per_second <= 0:
+            return []
+        samples = np.memmap(audio_path, dtype="<i2", mode="r")
+        bucket = max(self.AUDIO_SAMPLE_RATE // self.peaks_per_second, 1)
+        peaks: List[float] = []
+        # 分块处理，长音频也不会整段载入内存
+        chunk = bucket * 4096
+        for offset in range(0, samples.size, chunk):
+            block = np.asarray(samples[offset:offset + chunk], dtype=np.int32)
+            pad = (-block.size) % bucket
+            if pad:
+                block = np.pad(block, (0, pad))
+            values = np.abs(block).reshape(-1, bucket).max(axis=1) / 32768.0
+            peaks.extend(np.round(values, 4).tolist())
+        return peaks
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import math
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+
+class MediaProbeError(Exception):
+    """Raised when ffprobe cannot read the media file."""
+
+
+def build_video_signature(video_path: str | Path) -> str:
+    """按文件 path+size+mtime 生成签名，作为 session_id 及各类缓存的键。"""
+    source = Path(video_path).resolve()
+    stat = source.stat()
+    base = f"{source}|{stat.st_size}|{stat.st_mtime}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
+
+
+class MediaProbe:
+    """
+    ffprobe 元数据缓存，按文件签名（path+size+mtime）缓存，内存 + 磁盘两级。
+    probe 只读容器与流头部（duration / fps / 分辨率 / 编码 / 是否有音轨），
+    场景检测、帧服务等环节共用，同一文件只探测一次。
+    关键帧时间需要扫描全部 packet，单独由 probe_keyframes 按需读取并缓存，扫描失败不缓存。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ffprobe_bin: Optional[str] = None) -> None:
+        self.cache_dir = Path(cache_dir or os.getenv("MEDIA_PROBE_CACHE_DIR", "probe_cache")).resolve()
+        self.ffprobe_bin = ffprobe_bin or os.getenv("FFPROBE_BIN", "ffprobe")
+        self._memory: Dict[str, dict] = {}
+        self._keyframes: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    # Public API -----------------------------------------------------
+
+    def probe(self, video_path: str) -> dict:
+        source = Path(video_path)
+        if not source.is_file():
+            raise MediaProbeError(f"视频不存在: {video_path}")
+        signature = build_video_signature(source)
+
+        with self._lock:
+            cached = self._memory.get(signature)
+        if cached is not None:
+            return cached
+
+        info = self._load_from_disk(signature)
+        if info is None:
+            info = self._run_probe(source)
+            self._save_to_disk(signature, info)
+        with self._lock:
+            self._memory[signature] = info
+        return info
+
+    def probe_keyframes(self, video_path: str) -> List[float]:
+        """关键帧时间（秒，升序）。只读 packet 标志位不解码，但需要读完整个文件。"""
+        source = Path(video_path)
+        if not source.is_file():
+            raise MediaProbeError(f"视频不存在: {video_path}")
+        signature = build_video_signature(source)
+
+        with self._lock:
+            cached = self._keyframes.get(signature)
+        if cached is not None:
+            return cached
+
+        cache_key = f"{signature}.keyframes"
+        stored = self._load_from_disk(cache_key)
+        if stored is not None and isinstance(stored.get("keyframe_times"), list):
+            times = stored["keyframe_times"]
+        else:
+            times = self._probe_keyframes(source)
+            self._save_to_disk(cache_key, {"keyframe_times": times})
+        with self._lock:
+            self._keyframes[signature] = times
+        return times
+
+    def get_duration(self, video_path: str) -> float:
+        return self.probe(video_path)["duration"]
+
+    def get_fps(self, video_path: str) -> float:
+        return self.probe(video_path)["fps"]
+
+    # Internal helpers ------------------------------------------------
+
+    def _run_probe(self, source: Path) -> dict:
+        streams_cmd = [
+            self.ffprobe_bin,
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration:stream=codec_type,codec_name,width,height,r_frame_rate,duration,nb_frames",
+            "-of",
+            "json",
+            str(source),
+        ]
+        try:
+            result = subprocess.run(streams_cmd, capture_output=True, text=True, check=True, timeout=30)
+            data = json.loads(result.stdout or "{}")
+        except (subprocess.SubprocessError, json.JSONDecodeError) as exc:
+            raise MediaProbeError("无法读取视频元数据") from exc
+
+        streams = data.get("streams") or []
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+        duration = self._to_float(video.get("duration")) or self._to_float((data.get("format") or {}).get("duration"))
+        fps = self._parse_rate(video.get("r_frame_rate"))
+        return {
+            "duration": duration,
+            "fps": fps,
+            "width": int(video.get("width") or 0),
+            "height": int(video.get("height") or 0),
+            "codec": video.get("codec_name"),
+            "frame_count": int(video["nb_frames"]) if str(video.get("nb_frames", "")).isdigit() else None,
+            "has_audio": audio is not None,
+            "audio_codec": audio.get("codec_name") if audio else None,
+        }
+
+    def _probe_keyframes(self, source: Path) -> List[float]:
+        # 只读取 packet 标志位，不解码
+        cmd = [
+            self.ffprobe_bin,
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,flags",
+            "-of",
+            "csv=p=0",
+            str(source),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=120)
+        except subprocess.SubprocessError as exc:
+            raise MediaProbeError("无法读取关键帧信息") from exc
+
+        times: List[float] = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" not in flags:
+                continue
+            timestamp = self._to_float(pts_time)
+            if timestamp >= 0:
+                times.append(round(timestamp, 6))
+        return sorted(times)
+
+    def _load_from_disk(self, signature: str) -> Optional[dict]:
+        path = self.cache_dir / f"{signature}.json"
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _save_to_disk(self, signature: str, info: dict) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{signature}.json.tmp"
+            tmp_path.write_text(json.dumps(info), encoding="utf-8")
+            os.replace(tmp_path, self.cache_dir / f"{signature}.json")
+        except OSError:
+            # 磁盘缓存失败不影响本次结果
+            pass
+
+    @staticmethod
+    def _to_float(value) -> float:
+        try:
+            result = float(value)
+        except (TypeError, ValueError):
+            return 0.0
+        return 0.0 if math.isnan(result) else result
+
+    @staticmethod
+    def _parse_rate(rate: Optional[str]) -> float:
+        fps = 24.0
+        try:
+            if rate:
+                if "/" in rate:
+                    num, den = rate.split("/", 1)
+                    fps = float(num) / float(den)
+                else:
+                    fps = float(rate)
+        except (ValueError, ZeroDivisionError):
+            fps = 24.0
+        if fps <= 0 or math.isnan(fps):
+            fps = 24.0
+        return fps
+
+
+# 全局单例
+media_probe = MediaProbe()
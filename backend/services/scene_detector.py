@@ -1,9 +1,20 @@
-import json
+import copy
 import math
 import os
 import re
 import subprocess
-from typing import Iterable, List, Tuple
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.media_probe import MediaProbeError, media_probe
+from services.opencv_scene_scorer import OpenCVSceneScorer
+from services.scene_score_cache import SceneScoreCache
 
 
 class SceneDetectionError(Exception):
@@ -17,11 +28,49 @@ class SceneDetector:
     - Refinement for very长 segments
     - Min scene duration + short-segment merge
     - Fallback uniform split when detection失败
+
+    检测模式（SCENE_DETECT_MODE）:
+    - multi_pass: 每个阈值各解码一次，长镜头细分再按片段解码
+    - single_pass: 只解码一次，记录每帧 scene 分数，所有阈值与细分在内存中向量化计算
+    - coarse_to_fine: 先粗扫找出疑似切点区间，再只对这些短窗口按原帧率计算分数，
+      把切点定位到准确的帧。粗扫尽量不解码：关键帧足够密时只解码关键帧，
+      否则跳过非参考帧并降帧率、降分辨率采样
+
+    并行模式（SCENE_PARALLEL_WORKERS>1）: 长视频按时间窗口切分（带少量重叠）并发跑 ffmpeg，
+    每个窗口只保留自己负责区间内的结果，再拼接去重。
+
+    检测档位（SCENE_DETECT_PROFILE）:
+    - full: 原始分辨率计算 scene 分数
+    - fast: 计算前先降采样（默认 240p，可选灰度 / 帧率上限），1080p/4K 源的滤镜开销大幅下降
+
+    检测后端（SCENE_DETECT_BACKEND）:
+    - ffmpeg: 调用 ffmpeg select/scene 滤镜
+    - opencv: 进程内 OpenCV 解码 + NumPy 批量计算，始终按分数数组（single_pass）流程处理
+
+    阈值模式（SCENE_THRESHOLD_MODE）:
+    - fixed: 使用 SCENE_THRESHOLD / SCENE_SECONDARY_THRESHOLD 固定阈值
+    - adaptive: 按视频自身分数分布逐帧计算阈值（滑动中位数 + k·MAD），
+      暗场 / 高运动素材无需反复调阈值重跑；始终按分数数组流程处理
+
+    预览（preview_scenes）: 不解码，只读关键帧标志位给出临时切点，供上传后立即展示。
+
+    传入 score_cache 后，multi_pass 也改走分数数组流程（与 single_pass 规则一致），
+    逐帧分数按视频签名落盘，调阈值时不再调用 ffmpeg，且与分析结果使用同一套切点规则。
     """
 
     _PTS_PATTERN = re.compile(r"pts_time:(?P<time>\d+(?:\.\d+)?)")
+    _FRAME_TIME_PATTERN = re.compile(r"pts_time:(?P<time>-?\d+(?:\.\d+)?)")
+    _SCORE_LINE_PREFIX = "lavfi.scene_score="
+    _SCORE_FILTER = "select='gte(scene,0)',metadata=print:file=-"
+    DETECT_MODES = ("multi_pass", "single_pass", "coarse_to_fine")
+    DETECT_PROFILES = ("full", "fast")
+    DETECT_BACKENDS = ("ffmpeg", "opencv")
+    THRESHOLD_MODES = ("fixed", "adaptive")
+    # 正态分布下 MAD 到标准差的换算系数
+    _MAD_SCALE = 1.4826
+    _ADAPTIVE_CHUNK_ROWS = 65536
 
-    def __init__(self) -> None:
+    def __init__(self, score_cache: Optional[SceneScoreCache] = None) -> None:
         # Thresholds roughly align with yesu 版本的策略
         self.primary_threshold = self._get_float("SCENE_THRESHOLD", 0.3)
         # 默认关闭副阈值，与 yesu 配置对齐；如需启用可设置 SCENE_SECONDARY_THRESHOLD 环境变量
@@ -34,15 +83,62 @@ class SceneDetector:
         self.long_scene_frame_threshold = int(os.getenv("SCENE_LONG_SCENE_FRAME_THRESHOLD", "150"))
         self.fallback_interval_seconds = self._get_float("SCENE_FALLBACK_INTERVAL", 10.0)
 
+        self.detect_mode = os.getenv("SCENE_DETECT_MODE", "multi_pass").strip().lower()
+        if self.detect_mode not in self.DETECT_MODES:
+            self.detect_mode = "multi_pass"
+
+        # 粗扫帧率 / 高度 / 阈值比例（相对最低阈值）/ 精扫窗口留白（秒）
+        # 关键帧平均间隔不超过 SCENE_COARSE_MAX_KEYFRAME_GAP 秒时改为只解码关键帧
+        self.coarse_fps = self._get_float("SCENE_COARSE_FPS", 4.0)
+        self.coarse_height = int(os.getenv("SCENE_COARSE_HEIGHT", "180"))
+        self.coarse_threshold_ratio = self._get_float("SCENE_COARSE_THRESHOLD_RATIO", 0.6)
+        self.coarse_padding_seconds = self._get_float("SCENE_COARSE_PADDING", 0.1)
+        self.coarse_max_keyframe_gap = self._get_float("SCENE_COARSE_MAX_KEYFRAME_GAP", 2.0)
+
+        self.detect_profile = os.getenv("SCENE_DETECT_PROFILE", "full").strip().lower()
+        if self.detect_profile not in self.DETECT_PROFILES:
+            self.detect_profile = "full"
+        self.fast_height = int(os.getenv("SCENE_FAST_HEIGHT", "240"))
+        self.fast_grayscale = os.getenv("SCENE_FAST_GRAYSCALE", "0").strip().lower() in ("1", "true", "yes")
+        self.fast_max_fps = self._get_float("SCENE_FAST_MAX_FPS", 0.0)
+
+        self.detect_backend = os.getenv("SCENE_DETECT_BACKEND", "ffmpeg").strip().lower()
+        if self.detect_backend not in self.DETECT_BACKENDS:
+            self.detect_backend = "ffmpeg"
+        self.opencv_height = int(os.getenv("SCENE_OPENCV_HEIGHT", "180"))
+        self.opencv_batch_size = int(os.getenv("SCENE_OPENCV_BATCH", "64"))
+
+        self.threshold_mode = os.getenv("SCENE_THRESHOLD_MODE", "fixed").strip().lower()
+        if self.threshold_mode not in self.THRESHOLD_MODES:
+            self.threshold_mode = "fixed"
+        # 滑动窗口长度（秒）、MAD 倍数，以及阈值下限（避免静态画面中噪声被当成切点）
+        self.adaptive_window_seconds = self._get_float("SCENE_ADAPTIVE_WINDOW", 2.0)
+        self.adaptive_k = self._get_float("SCENE_ADAPTIVE_K", 6.0)
+        self.adaptive_min_threshold = self._get_float("SCENE_ADAPTIVE_MIN_THRESHOLD", 0.03)
+
+        # 并行分段检测，默认关闭；SCENE_PARALLEL_WORKERS=auto 使用全部 CPU 核
+        self.parallel_workers = self._get_workers("SCENE_PARALLEL_WORKERS", 0)
+        self.parallel_chunk_seconds = self._get_float("SCENE_PARALLEL_CHUNK_SECONDS", 120.0)
+        self.parallel_overlap_seconds = self._get_float("SCENE_PARALLEL_OVERLAP", 1.0)
+        self.parallel_min_duration = self._get_float("SCENE_PARALLEL_MIN_DURATION", 300.0)
+
+        # 边上传边检测时总时长未知，超过该秒数既没有新数据写入也没有新分数输出即终止 ffmpeg
+        self.stream_idle_timeout = self._get_float("SCENE_STREAM_IDLE_TIMEOUT", 120.0)
+
         self.ffmpeg_bin = os.getenv("FFMPEG_BIN", "ffmpeg")
-        self.ffprobe_bin = os.getenv("FFPROBE_BIN", "ffprobe")
+        self.score_cache = score_cache
 
     # Public API ----------------------------------------------------------
 
     def detect_scenes(self, video_path: str) -> List[dict]:
         duration, fps = self._probe_video(video_path)
         try:
-            candidate_times = self._collect_candidate_times(video_path, duration, fps)
+            if self._uses_score_arrays():
+                candidate_times = self._collect_candidate_times_single_pass(video_path, duration, fps)
+            elif self.detect_mode == "coarse_to_fine":
+                candidate_times = self._collect_candidate_times_coarse_to_fine(video_path, duration, fps)
+            else:
+                candidate_times = self._collect_candidate_times(video_path, duration, fps)
             fallback = False
         except SceneDetectionError:
             candidate_times = []
@@ -53,65 +149,210 @@ class SceneDetector:
             fallback = True
 
         cut_times = self._build_cut_times(candidate_times, duration, fps, fallback)
-        return [
-            {
-                "time": round(ts, 3),
-                "type": "boundary" if idx in (0, len(cut_times) - 1) else ("fallback" if fallback else "auto"),
-            }
-            for idx, ts in enumerate(cut_times)
-        ]
+        return self._format_cuts(cut_times, fallback)
+
+    def preview_scenes(self, video_path: str) -> dict:
+        """
+        不解码的预览切点：只用 media_probe 读取的关键帧时间（packet 标志位），上传后即可返回。
+        编码器在场景切换处插入的关键帧间隔不规则，按固定 GOP 强制插入的关键帧予以剔除。
+        内部切点类型为 preview，完整检测（detect_scenes）完成后应整体替换。
+        """
+        try:
+            info = media_probe.probe(video_path)
+            keyframe_times = np.asarray(media_probe.probe_keyframes(video_path), dtype=np.float64)
+        except MediaProbeError as exc:
+            raise SceneDetectionError("无法读取视频元数据") from exc
+        duration, fps = info["duration"], info["fps"]
+        candidate_times = self._scene_cut_keyframes(keyframe_times, fps)
+        cut_times = self._build_cut_times(candidate_times, duration, fps, fallback=False)
+        return {"duration": duration, "cuts": self._format_cuts(cut_times, False, inner_type="preview")}
+
+    def detect_scenes_from_stream(self, chunks: Iterable[bytes], video_path: str) -> List[dict]:
+        """
+        边接收边检测：chunks 为仍在上传中的视频字节，逐块写入 video_path，同时经 stdin 交给 ffmpeg 计算分数，
+        解码与网络传输重叠。切点按分数数组规则（同 single_pass）计算，分数写入 score_cache。
+        容器无法流式解码（如 moov 位于文件末尾的 MP4）或非 ffmpeg 后端时，写完后按文件走 detect_scenes。
+        """
+        streamed = None
+        with open(video_path, "wb") as sink:
+            tee = self._tee_chunks(chunks, sink)
+            if self.detect_backend == "ffmpeg":
+                streamed = self._extract_scores_from_pipe(tee)
+            for _ in tee:
+                pass
+
+        if streamed is None or streamed[0].size == 0:
+            return self.detect_scenes(video_path)
+        times, scores = streamed
+        duration, fps = self._probe_video(video_path)
+        if self.score_cache is not None:
+            key = self.score_cache_key(self.score_cache.signature_for(video_path))
+            self.score_cache.save(key, times, scores, duration, fps)
+        return self.detect_from_scores(times, scores, duration, fps)
 
     def get_duration(self, video_path: str) -> float:
         duration, _ = self._probe_video(video_path)
         return float(duration or 0.0)
 
+    def get_scene_scores(self, video_path: str) -> dict:
+        """
+        返回 {times, scores, duration, fps}。
+        优先读取 score_cache（mmap），缺失时解码一次并写入缓存。
+        """
+        cached = self._load_cached_scores(video_path)
+        if cached is not None:
+            return cached
+        duration, fps = self._probe_video(video_path)
+        return self._extract_and_cache_scores(video_path, duration, fps)
+
+    def iter_detect_events(self, video_path: str) -> Iterator[dict]:
+        """
+        流式检测：边解码边产出事件，不缓冲 ffmpeg 输出。
+        - {"event": "cut", "time"}: 达到主阈值且满足最短镜头时长的临时切点
+        - {"event": "progress", "percent", "time"}: 每前进 1% 产出一次
+        - {"event": "done", "duration", "cuts"}: 与 detect_scenes 相同规则计算的最终切点
+        """
+        duration, fps = self._probe_video(video_path)
+        thresholds = self._active_thresholds()
+        threshold = min(thresholds) if thresholds else None
+
+        times = array("d")
+        scores = array("f")
+        last_cut = 0.0
+        last_percent = -1
+        for timestamp, score in self._iter_scene_scores(video_path, duration):
+            times.append(timestamp)
+            scores.append(score)
+            if (
+                threshold is not None
+                and score > threshold
+                and 0 < timestamp < duration
+                and timestamp - last_cut >= self.min_scene_duration
+            ):
+                last_cut = timestamp
+                yield {"event": "cut", "time": round(timestamp, 3)}
+            percent = min(int(timestamp / duration * 100), 100) if duration > 0 else 0
+            if percent > last_percent:
+                last_percent = percent
+                yield {"event": "progress", "percent": percent, "time": round(timestamp, 3)}
+
+        times_array = np.frombuffer(times, dtype=np.float64)
+        scores_array = np.frombuffer(scores, dtype=np.float32)
+        if self.score_cache is not None and times_array.size:
+            key = self.score_cache_key(self.score_cache.signature_for(video_path))
+            self.score_cache.save(key, times_array, scores_array, duration, fps)
+        yield {
+            "event": "done",
+            "duration": duration,
+            "cuts": self.detect_from_scores(times_array, scores_array, duration, fps),
+        }
+
+    def redetect_window(
+        self,
+        video_path: str,
+        start: float,
+        end: float,
+        existing_cuts: List[dict],
+        threshold: Optional[float] = None,
+    ) -> dict:
+        """
+        只在 [start, end) 内重新检测切点并合并回 existing_cuts。
+        窗口内原有切点被新结果替换，窗口外切点原样保留；
+        优先使用缓存的逐帧分数，否则只解码该窗口。
+        """
+        duration, fps = self._probe_video(video_path)
+        start = max(start, 0.0)
+        end = min(end, duration) if duration > 0 else end
+        if end <= start:
+            raise SceneDetectionError("无效的检测区间")
+        if threshold is None:
+            threshold = self.secondary_threshold or self.primary_threshold
+
+        times, scores = self._window_scores(video_path, duration, start, end)
+        candidates = times[(times > start) & (times < end) & (scores > threshold)]
+
+        outside = [cut for cut in existing_cuts if not start < cut["time"] < end]
+        left = max((cut["time"] for cut in outside if cut["time"] <= start), default=0.0)
+        right = min((cut["time"] for cut in outside if cut["time"] >= end), default=duration)
+
+        # 与两侧保留的切点之间同样遵守最短镜头时长
+        added: list[float] = []
+        previous = left
+        for timestamp in candidates.tolist():
+            if timestamp - previous >= self.min_scene_duration and right - timestamp >= self.min_scene_duration:
+                added.append(round(timestamp, 3))
+                previous = timestamp
+
+        merged = outside + [{"time": timestamp, "type": "auto"} for timestamp in added]
+        merged.sort(key=lambda cut: cut["time"])
+        return {"duration": duration, "cuts": merged, "added": added}
+
+    def detect_from_scores(
+        self,
+        times: np.ndarray,
+        scores: np.ndarray,
+        duration: float,
+        fps: float,
+    ) -> List[dict]:
+        """用已有的分数数组计算切点，不调用 ffmpeg。"""
+        candidate_times = self._candidate_times_from_scores(times, scores, duration, fps)
+        fallback = not candidate_times
+        if fallback:
+            candidate_times = self._generate_fallback_times(duration)
+        cut_times = self._build_cut_times(candidate_times, duration, fps, fallback)
+        return self._format_cuts(cut_times, fallback)
+
+    def with_overrides(
+        self,
+        primary_threshold: Optional[float] = None,
+        min_scene_duration: Optional[float] = None,
+        merge_frame_threshold: Optional[int] = None,
+    ) -> "SceneDetector":
+        """返回覆盖部分参数后的副本，用于调参而不影响环境变量配置。"""
+        tuned = copy.copy(self)
+        if primary_threshold is not None:
+            # 显式指定阈值时退回固定阈值模式
+            tuned.threshold_mode = "fixed"
+            tuned.primary_threshold = primary_threshold
+            if tuned.secondary_threshold is not None and tuned.secondary_threshold >= primary_threshold:
+                tuned.secondary_threshold = None
+        if min_scene_duration is not None:
+            tuned.min_scene_duration = min_scene_duration
+        if merge_frame_threshold is not None:
+            tuned.merge_frame_threshold = merge_frame_threshold
+        return tuned
+
+    def score_cache_key(self, signature: str) -> str:
+        """不同后端/档位的分数不可混用，非默认配置在签名后追加标识。"""
+        parts: list[str] = []
+        if self.detect_backend == "opencv":
+            parts.append(f"opencv-h{self.opencv_height}")
+        elif self.detect_profile == "fast":
+            parts.extend([self.detect_profile, f"h{self.fast_height}"])
+            if self.fast_grayscale:
+                parts.append("gray")
+            if self.fast_max_fps > 0:
+                parts.append(f"fps{self.fast_max_fps:g}")
+        if not parts:
+            return signature
+        return f"{signature}-{'-'.join(parts)}"
+
     # Internal helpers ----------------------------------------------------
 
     def _probe_video(self, video_path: str) -> Tuple[float, float]:
-        cmd = [
-            self.ffprobe_bin,
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=r_frame_rate,duration",
-            "-of",
-            "json",
-            video_path,
-        ]
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=30,
-            )
-        except subprocess.SubprocessError as exc:  # pragma: no cover
+            info = media_probe.probe(video_path)
+        except MediaProbeError as exc:
             raise SceneDetectionError("无法读取视频元数据") from exc
+        return info["duration"], info["fps"]
 
-        duration = 0.0
-        fps = 24.0
-        try:
-            data = json.loads(result.stdout)
-            stream = (data.get("streams") or [{}])[0]
-            duration_str = stream.get("duration")
-            if duration_str is not None:
-                duration = float(duration_str)
-            fps_str = stream.get("r_frame_rate")
-            if fps_str:
-                if "/" in fps_str:
-                    num, den = fps_str.split("/", 1)
-                    fps = float(num) / float(den)
-                else:
-                    fps = float(fps_str)
-        except (ValueError, KeyError, IndexError, json.JSONDecodeError):
-            pass
-
-        if fps <= 0 or math.isnan(fps):
-            fps = 24.0
-        return duration, fps
+    def _uses_score_arrays(self) -> bool:
+        return (
+            self.detect_mode == "single_pass"
+            or (self.detect_mode == "multi_pass" and self.score_cache is not None)
+            or self.detect_backend == "opencv"
+            or self.threshold_mode == "adaptive"
+        )
 
     def _collect_candidate_times(
         self,
@@ -119,16 +360,9 @@ class SceneDetector:
         duration: float,
         fps: float,
     ) -> List[float]:
-        thresholds: list[float] = []
-        if self.primary_threshold and self.primary_threshold > 0:
-            thresholds.append(self.primary_threshold)
-        if self.secondary_threshold and self.secondary_threshold > 0:
-            thresholds.append(self.secondary_threshold)
-
         collected: set[float] = set()
-        for threshold in thresholds:
-            output = self._run_ffmpeg_scene_detect(video_path, duration, threshold)
-            collected.update(self._parse_scene_times(output, duration))
+        for threshold in self._active_thresholds():
+            collected.update(self._detect_threshold_times(video_path, duration, fps, threshold))
 
         if not collected:
             return []
@@ -136,6 +370,216 @@ class SceneDetector:
         candidates = sorted(collected)
         return self._refine_long_segments(video_path, candidates, duration, fps)
 
+    def _detect_threshold_times(
+        self,
+        video_path: str,
+        duration: float,
+        fps: float,
+        threshold: float,
+    ) -> List[float]:
+        windows = self._plan_windows(duration)
+        if len(windows) == 1:
+            output = self._run_ffmpeg_scene_detect(video_path, duration, threshold)
+            return self._parse_scene_times(output, duration)
+
+        def detect_window(start: float, end: float) -> List[float]:
+            read_start = max(start - self.parallel_overlap_seconds, 0.0)
+            output = self._run_ffmpeg_scene_detect(
+                video_path,
+                duration=end - read_start,
+                threshold=threshold,
+                start=read_start,
+                end=end,
+            )
+            times = (read_start + t for t in self._parse_scene_times(output, end - read_start))
+            # 重叠区只用于给窗口首帧提供参考帧，结果归属前一个窗口
+            return [t for t in times if start <= t < end]
+
+        chunks = self._map_windows(detect_window, windows)
+        return self._dedupe_times((t for chunk in chunks for t in chunk), fps)
+
+    def _plan_windows(self, duration: float) -> List[Tuple[float, float]]:
+        """返回各窗口负责的 [start, end) 区间；不满足并行条件时只有一个整段窗口。"""
+        if (
+            self.parallel_workers <= 1
+            or self.parallel_chunk_seconds <= 0
+            or duration < max(self.parallel_min_duration, self.parallel_chunk_seconds * 2)
+        ):
+            return [(0.0, duration)]
+        count = math.ceil(duration / self.parallel_chunk_seconds)
+        step = duration / count
+        return [(step * idx, duration if idx == count - 1 else step * (idx + 1)) for idx in range(count)]
+
+    def _map_windows(self, func: Callable[[float, float], object], windows: List[Tuple[float, float]]) -> list:
+        if self.parallel_workers <= 1 or len(windows) <= 1:
+            return [func(start, end) for start, end in windows]
+        # ffmpeg 在子进程中解码，线程池只负责等待，不受 GIL 限制
+        with ThreadPoolExecutor(max_workers=min(self.parallel_workers, len(windows))) as pool:
+            return list(pool.map(lambda window: func(*window), windows))
+
+    @staticmethod
+    def _dedupe_times(times: Iterable[float], fps: float) -> List[float]:
+        min_gap = 0.5 / fps if fps > 0 else 0.0
+        deduped: list[float] = []
+        for timestamp in sorted(times):
+            if deduped and timestamp - deduped[-1] < min_gap:
+                continue
+            deduped.append(timestamp)
+        return deduped
+
+    def _collect_candidate_times_single_pass(
+        self,
+        video_path: str,
+        duration: float,
+        fps: float,
+    ) -> List[float]:
+        data = self._load_or_extract_scores(video_path, duration, fps)
+        return self._candidate_times_from_scores(data["times"], data["scores"], duration, fps)
+
+    def _collect_candidate_times_coarse_to_fine(
+        self,
+        video_path: str,
+        duration: float,
+        fps: float,
+    ) -> List[float]:
+        thresholds = self._active_thresholds()
+        if not thresholds or self.coarse_fps <= 0 or self.detect_backend != "ffmpeg":
+            return self._collect_candidate_times_single_pass(video_path, duration, fps)
+
+        keyframes_only = self._coarse_uses_keyframes(video_path)
+        sample_times, sample_scores = self._extract_coarse_scores(video_path, duration, keyframes_only)
+        hits = sample_scores > min(thresholds) * self.coarse_threshold_ratio
+        windows = self._coarse_refine_windows(sample_times, hits, duration, keyframes_only)
+        if not windows:
+            return []
+
+        def refine_window(start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+            times, scores = self._extract_scene_scores(video_path, duration, start=start, end=end)
+            # 窗口首帧没有参考帧，分数无效；切点不可能落在该帧上
+            mask = times > start + (0.5 / fps if fps > 0 else 0.0)
+            return times[mask], scores[mask]
+
+        parts = self._map_windows(refine_window, windows)
+        times = np.concatenate([times for times, _ in parts])
+        scores = np.concatenate([scores for _, scores in parts])
+        return self._candidate_times_from_scores(times, scores, duration, fps)
+
+    def _coarse_uses_keyframes(self, video_path: str) -> bool:
+        try:
+            keyframe_times = media_probe.probe_keyframes(video_path)
+        except MediaProbeError:
+            return False
+        if len(keyframe_times) < 3 or self.coarse_max_keyframe_gap <= 0:
+            return False
+        return float(np.median(np.diff(keyframe_times))) <= self.coarse_max_keyframe_gap
+
+    def _extract_coarse_scores(
+        self,
+        video_path: str,
+        duration: float,
+        keyframes_only: bool,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        粗扫分数：相邻采样帧之间的 scene 分数。
+        关键帧模式下解码器直接丢弃非关键帧；否则跳过非参考帧（B 帧）并按 coarse_fps 采样。
+        """
+        filters: list[str] = []
+        if keyframes_only:
+            input_options = ["-skip_frame", "nokey"]
+        else:
+            input_options = ["-skip_frame", "noref"]
+            filters.append(f"fps=fps='min(source_fps,{self.coarse_fps:g})'")
+        if self.coarse_height > 0:
+            filters.append(f"scale=-2:{self.coarse_height}:flags=fast_bilinear")
+        return self._extract_scene_scores(
+            video_path,
+            duration,
+            filter_prefix="".join(f"{item}," for item in filters),
+            input_options=input_options,
+        )
+
+    def _coarse_refine_windows(
+        self,
+        sample_times: np.ndarray,
+        hits: np.ndarray,
+        duration: float,
+        keyframes_only: bool,
+    ) -> List[Tuple[float, float]]:
+        """
+        命中的采样点 t_i 表示切点落在 (t_{i-1}, t_i]，两侧留白后合并重叠区间。
+        关键帧模式下窗口起点本身就是关键帧，左侧不留白，避免 seek 时多解码一个 GOP。
+        """
+        left_pad = 0.0 if keyframes_only else self.coarse_padding_seconds
+        windows: list[Tuple[float, float]] = []
+        for idx in np.flatnonzero(hits).tolist():
+            previous = sample_times[idx - 1] if idx > 0 else 0.0
+            start = max(float(previous) - left_pad, 0.0)
+            end = min(float(sample_times[idx]) + self.coarse_padding_seconds, duration)
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            elif end > start:
+                windows.append((start, end))
+        return windows
+
+    @staticmethod
+    def _scene_cut_keyframes(keyframe_times: np.ndarray, fps: float) -> List[float]:
+        """
+        从关键帧时间中挑出疑似场景切换处的关键帧。
+        距上一关键帧恰好达到最大间隔（keyint）的关键帧是编码器强制插入的；
+        最大间隔只出现一次时视为普通镜头长度，不做剔除。全部为固定间隔时返回空列表。
+        """
+        if keyframe_times.size < 2:
+            return []
+        gaps = np.diff(keyframe_times)
+        tolerance = 1.5 / fps if fps > 0 else 0.05
+        forced = gaps >= gaps.max() - tolerance
+        if np.count_nonzero(forced) < 2:
+            forced[:] = False
+        return keyframe_times[1:][~forced].tolist()
+
+    def _load_cached_scores(self, video_path: str) -> Optional[dict]:
+        if self.score_cache is None:
+            return None
+        return self.score_cache.load(self.score_cache_key(self.score_cache.signature_for(video_path)))
+
+    def _load_or_extract_scores(self, video_path: str, duration: float, fps: float) -> dict:
+        cached = self._load_cached_scores(video_path)
+        if cached is not None:
+            return cached
+        return self._extract_and_cache_scores(video_path, duration, fps)
+
+    def _extract_and_cache_scores(self, video_path: str, duration: float, fps: float) -> dict:
+        times, scores = self._extract_all_scene_scores(video_path, duration)
+        if self.score_cache is not None and times.size:
+            key = self.score_cache_key(self.score_cache.signature_for(video_path))
+            self.score_cache.save(key, times, scores, duration, fps)
+        return {"times": times, "scores": scores, "duration": duration, "fps": fps}
+
+    def _window_scores(
+        self,
+        video_path: str,
+        duration: float,
+        start: float,
+        end: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._load_cached_scores(video_path)
+        if cached is not None:
+            mask = (cached["times"] >= start) & (cached["times"] < end)
+            return np.asarray(cached["times"][mask]), np.asarray(cached["scores"][mask])
+        # 往前多读一小段，保证窗口首帧有参考帧
+        read_start = max(start - self.parallel_overlap_seconds, 0.0)
+        times, scores = self._extract_scene_scores(video_path, duration, start=read_start, end=end)
+        mask = times >= start
+        return times[mask], scores[mask]
+
+    def _active_thresholds(self) -> List[float]:
+        thresholds: list[float] = []
+        if self.primary_threshold and self.primary_threshold > 0:
+            thresholds.append(self.primary_threshold)
+        if self.secondary_threshold and self.secondary_threshold > 0:
+            thresholds.append(self.secondary_threshold)
+        return thresholds
+
     def _run_ffmpeg_scene_detect(
         self,
         video_path: str,
@@ -144,35 +588,336 @@ class SceneDetector:
         start: float | None = None,
         end: float | None = None,
     ) -> str:
-        timeout = max(int(duration * 2), 60)
+        cmd = self._build_ffmpeg_cmd(
+            video_path,
+            f"select='gt(scene,{threshold})',showinfo",
+            start=start,
+            end=end,
+        )
+        return self._run_ffmpeg(cmd, duration)
+
+    def _iter_scene_scores(
+        self,
+        video_path: str,
+        duration: float,
+        start: float | None = None,
+        end: float | None = None,
+        filter_prefix: Optional[str] = None,
+        input_options: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[float, float]]:
+        """
+        逐帧产出 (源视频绝对时间, scene_score)。
+        ffmpeg 后端用 metadata=print:file=- 把每帧分数写到 stdout，按行读取，内存占用与视频长度无关。
+        filter_prefix 为 None 时使用检测档位对应的前置滤镜；input_options 加在 -i 之前（如 -skip_frame）。
+        """
+        if self.detect_backend == "opencv":
+            yield from self._iter_opencv_scores(video_path, start, end)
+            return
+
+        offset = start or 0.0
+        cmd = self._build_ffmpeg_cmd(
+            video_path,
+            self._SCORE_FILTER,
+            start=start,
+            end=end,
+            filter_prefix=filter_prefix,
+            input_options=input_options,
+        )
+        timed_out = threading.Event()
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(max(duration * 2, 60), kill_on_timeout)
+        watchdog.start()
+        try:
+            yield from self.parse_score_lines(process.stdout, offset)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise SceneDetectionError("FFmpeg 检测超时")
+        if process.returncode != 0:
+            raise SceneDetectionError("FFmpeg 检测失败")
+
+    @staticmethod
+    def _tee_chunks(chunks: Iterable[bytes], sink) -> Iterator[bytes]:
+        for chunk in chunks:
+            sink.write(chunk)
+            yield chunk
+
+    def _extract_scores_from_pipe(self, chunks: Iterator[bytes]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        从 stdin 读入视频计算逐帧分数；ffmpeg 失败或空闲超时时返回 None。返回前 chunks 一定已被全部消费。
+        """
+        cmd = [
+            self.ffmpeg_bin,
+            "-hide_banner",
+            "-loglevel",
+            "info",
+            "-i",
+            "pipe:0",
+            "-vf",
+            self.score_filter(),
+            "-an",
+            "-f",
+            "null",
+            "-",
+        ]
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        last_activity = [time.monotonic()]
+        finished = threading.Event()
+
+        def feed() -> None:
+            writable = True
+            try:
+                # ffmpeg 提前退出后仍要读完 chunks，保证上传文件完整落盘
+                for chunk in chunks:
+                    if not writable:
+                        continue
+                    try:
+                        process.stdin.buffer.write(chunk)
+                        last_activity[0] = time.monotonic()
+                    except OSError:
+                        writable = False
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        def watch() -> None:
+            # 总时长未知，按空闲时间判定卡死（上传停滞时同样会触发，之后退回按文件检测）
+            while not finished.wait(1.0):
+                if time.monotonic() - last_activity[0] > self.stream_idle_timeout:
+                    timed_out.set()
+                    process.kill()
+                    return
+
+        timed_out = threading.Event()
+        feeder = threading.Thread(target=feed, daemon=True)
+        watchdog = threading.Thread(target=watch, daemon=True)
+        feeder.start()
+        watchdog.start()
+        times = array("d")
+        scores = array("f")
+        try:
+            for timestamp, score in self.parse_score_lines(process.stdout):
+                times.append(timestamp)
+                scores.append(score)
+                last_activity[0] = time.monotonic()
+            feeder.join()
+            process.wait()
+        finally:
+            finished.set()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            feeder.join()
+            watchdog.join()
+
+        if timed_out.is_set() or process.returncode != 0:
+            return None
+        return np.frombuffer(times, dtype=np.float64), np.frombuffer(scores, dtype=np.float32)
+
+    def score_filter(self) -> str:
+        """逐帧打印 scene 分数的滤镜链（含检测档位前置滤镜），供其它 ffmpeg 滤镜图复用。"""
+        return self._profile_filter_prefix() + self._SCORE_FILTER
+
+    def parse_score_lines(self, lines: Iterable[str], offset: float = 0.0) -> Iterator[Tuple[float, float]]:
+        """解析 metadata=print 输出，逐帧产出 (offset + pts_time, scene_score)。"""
+        pending_time: float | None = None
+        for line in lines:
+            if line.startswith("frame:"):
+                match = self._FRAME_TIME_PATTERN.search(line)
+                pending_time = float(match.group("time")) if match else None
+            elif line.startswith(self._SCORE_LINE_PREFIX) and pending_time is not None:
+                try:
+                    score = float(line[len(self._SCORE_LINE_PREFIX):])
+                except ValueError:
+                    continue
+                yield offset + pending_time, score
+                pending_time = None
+
+    def _build_ffmpeg_cmd(
+        self,
+        video_path: str,
+        video_filter: str,
+        start: float | None = None,
+        end: float | None = None,
+        filter_prefix: Optional[str] = None,
+        input_options: Optional[List[str]] = None,
+    ) -> List[str]:
         cmd = [self.ffmpeg_bin, "-hide_banner", "-loglevel", "info"]
+        cmd.extend(input_options or [])
         if start is not None:
             cmd.extend(["-ss", f"{start:.3f}"])
         cmd.extend(["-i", video_path])
         if end is not None and start is not None and end > start:
             cmd.extend(["-to", f"{end - start:.3f}"])
-        cmd.extend(
-            [
-                "-vf",
-                f"select='gt(scene,{threshold})',showinfo",
-                "-f",
-                "null",
-                "-",
-            ]
+        if filter_prefix is None:
+            filter_prefix = self._profile_filter_prefix()
+        cmd.extend(["-vf", filter_prefix + video_filter, "-an", "-f", "null", "-"])
+        return cmd
+
+    def _profile_filter_prefix(self) -> str:
+        """fast 档位在 scene 计算前插入的滤镜链，full 档位为空。"""
+        if self.detect_profile != "fast":
+            return ""
+        filters: list[str] = []
+        if self.fast_max_fps > 0:
+            # 只限制上限，低帧率源保持原帧率，不会补帧
+            filters.append(f"fps=fps='min(source_fps,{self.fast_max_fps:g})'")
+        if self.fast_height > 0:
+            filters.append(f"scale=-2:{self.fast_height}:flags=fast_bilinear")
+        if self.fast_grayscale:
+            filters.append("format=gray")
+        return "".join(f"{item}," for item in filters)
+
+    def _run_ffmpeg(self, cmd: List[str], duration: float) -> str:
+        """
+        逐行读取 ffmpeg stderr，只保留 showinfo 输出的帧行（含 pts_time）。
+        超过阈值的帧才会打印，内存占用与视频长度无关。
+        """
+        timed_out = threading.Event()
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
         )
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(max(int(duration * 2), 60), kill_on_timeout)
+        watchdog.start()
+        lines: list[str] = []
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=timeout,
-            )
-        except subprocess.TimeoutExpired as exc:
-            raise SceneDetectionError("FFmpeg 检测超时") from exc
-        except subprocess.CalledProcessError as exc:
-            raise SceneDetectionError("FFmpeg 检测失败") from exc
-        return result.stderr
+            for line in process.stderr:
+                if "pts_time:" in line:
+                    lines.append(line)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stderr.close()
+
+        if timed_out.is_set():
+            raise SceneDetectionError("FFmpeg 检测超时")
+        if process.returncode != 0:
+            raise SceneDetectionError("FFmpeg 检测失败")
+        return "".join(lines)
+
+    def _extract_scene_scores(
+        self,
+        video_path: str,
+        duration: float,
+        start: float | None = None,
+        end: float | None = None,
+        filter_prefix: Optional[str] = None,
+        input_options: Optional[List[str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """一次解码得到 (times, scores)，times 为 float64 秒，scores 为 float32。"""
+        window = duration if start is None or end is None else end - start
+        times = array("d")
+        scores = array("f")
+        for timestamp, score in self._iter_scene_scores(
+            video_path, window, start=start, end=end, filter_prefix=filter_prefix, input_options=input_options
+        ):
+            times.append(timestamp)
+            scores.append(score)
+        return np.frombuffer(times, dtype=np.float64), np.frombuffer(scores, dtype=np.float32)
+
+    def _iter_opencv_scores(
+        self,
+        video_path: str,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> Iterator[Tuple[float, float]]:
+        scorer = OpenCVSceneScorer(height=self.opencv_height, batch_size=self.opencv_batch_size)
+        try:
+            yield from scorer.iter_scores(video_path, start=start, end=end)
+        except (OSError, cv2.error) as exc:
+            raise SceneDetectionError("OpenCV 检测失败") from exc
+
+    def _extract_all_scene_scores(self, video_path: str, duration: float) -> Tuple[np.ndarray, np.ndarray]:
+        windows = self._plan_windows(duration)
+        if len(windows) == 1:
+            return self._extract_scene_scores(video_path, duration)
+
+        def extract_window(start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+            read_start = max(start - self.parallel_overlap_seconds, 0.0)
+            times, scores = self._extract_scene_scores(video_path, duration, start=read_start, end=end)
+            owned = (times >= start) & (times < end)
+            return times[owned], scores[owned]
+
+        parts = self._map_windows(extract_window, windows)
+        return (
+            np.concatenate([times for times, _ in parts]),
+            np.concatenate([scores for _, scores in parts]),
+        )
+
+    def _candidate_times_from_scores(
+        self,
+        times: np.ndarray,
+        scores: np.ndarray,
+        duration: float,
+        fps: float,
+    ) -> List[float]:
+        if times.size == 0:
+            return []
+        inside = (times > 0) & (times < duration)
+        if self.threshold_mode == "adaptive":
+            candidates = times[inside & (scores > self._adaptive_thresholds(scores, fps))]
+        else:
+            thresholds = self._active_thresholds()
+            if not thresholds:
+                return []
+            # 多阈值取并集等价于取最低阈值
+            candidates = times[inside & (scores > min(thresholds))]
+        if candidates.size == 0:
+            return []
+        return self._refine_long_segments_from_scores(times, scores, candidates, duration, fps)
+
+    def _adaptive_thresholds(self, scores: np.ndarray, fps: float) -> np.ndarray:
+        """逐帧阈值 = 滑动中位数 + k·MAD，窗口以当前帧为中心，边缘镜像填充。"""
+        window = max(int(self.adaptive_window_seconds * (fps or 25.0)) | 1, 3)
+        values = np.asarray(scores, dtype=np.float32)
+        padded = np.pad(values, window // 2, mode="reflect" if values.size > window // 2 else "edge")
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+
+        thresholds = np.empty(values.size, dtype=np.float32)
+        # 分块计算，中位数需要复制窗口数据，避免长视频一次性占用 n × window 内存
+        for begin in range(0, values.size, self._ADAPTIVE_CHUNK_ROWS):
+            chunk = windows[begin:begin + self._ADAPTIVE_CHUNK_ROWS]
+            median = np.median(chunk, axis=1)
+            mad = np.median(np.abs(chunk - median[:, None]), axis=1) * self._MAD_SCALE
+            thresholds[begin:begin + chunk.shape[0]] = median + self.adaptive_k * mad
+        return np.maximum(thresholds, self.adaptive_min_threshold)
 
     def _parse_scene_times(self, ffmpeg_output: str, duration: float) -> List[float]:
         times: list[float] = []
@@ -203,25 +948,62 @@ class SceneDetector:
             and self.secondary_threshold > 0
             and self.long_scene_frame_threshold > 0
         ):
-            for start, end in segments:
-                frames = (end - start) * fps
-                if frames > self.long_scene_frame_threshold:
-                    try:
-                        output = self._run_ffmpeg_scene_detect(
-                            video_path,
-                            duration=end - start,
-                            threshold=self.secondary_threshold,
-                            start=start,
-                            end=end,
-                        )
-                        sub_times = self._parse_scene_times(output, end - start)
-                        extra_times.update(start + t for t in sub_times)
-                    except SceneDetectionError:
-                        continue
+            def refine_segment(start: float, end: float) -> List[float]:
+                try:
+                    output = self._run_ffmpeg_scene_detect(
+                        video_path,
+                        duration=end - start,
+                        threshold=self.secondary_threshold,
+                        start=start,
+                        end=end,
+                    )
+                except SceneDetectionError:
+                    return []
+                sub_times = self._parse_scene_times(output, end - start)
+                return [start + t for t in sub_times]
+
+            long_segments = [
+                (start, end)
+                for start, end in segments
+                if (end - start) * fps > self.long_scene_frame_threshold
+            ]
+            for sub_times in self._map_windows(refine_segment, long_segments):
+                extra_times.update(sub_times)
 
         combined = sorted(set(times).union(extra_times))
         return combined
 
+    def _refine_long_segments_from_scores(
+        self,
+        times: np.ndarray,
+        scores: np.ndarray,
+        candidate_times: np.ndarray,
+        duration: float,
+        fps: float,
+    ) -> List[float]:
+        cuts = np.unique(candidate_times)
+        if not (
+            self.secondary_threshold
+            and self.secondary_threshold > 0
+            and self.long_scene_frame_threshold > 0
+        ):
+            return cuts.tolist()
+
+        bounds = np.concatenate(([0.0], cuts, [duration]))
+        long_segments = np.diff(bounds) * fps > self.long_scene_frame_threshold
+        if not long_segments.any():
+            return cuts.tolist()
+
+        # 每帧所属片段下标，片段起点本身不参与细分（与按片段解码的行为一致）
+        segment_idx = np.clip(np.searchsorted(bounds, times, side="right") - 1, 0, long_segments.size - 1)
+        mask = (
+            long_segments[segment_idx]
+            & (times > bounds[segment_idx])
+            & (times < duration)
+            & (scores > self.secondary_threshold)
+        )
+        return np.union1d(cuts, times[mask]).tolist()
+
     def _generate_fallback_times(self, duration: float) -> List[float]:
         if duration <= 0:
             return []
@@ -245,6 +1027,16 @@ class SceneDetector:
             filtered.append(duration)
         return filtered
 
+    @staticmethod
+    def _format_cuts(cut_times: List[float], fallback: bool, inner_type: str = "auto") -> List[dict]:
+        return [
+            {
+                "time": round(ts, 3),
+                "type": "boundary" if idx in (0, len(cut_times) - 1) else ("fallback" if fallback else inner_type),
+            }
+            for idx, ts in enumerate(cut_times)
+        ]
+
     def _apply_min_scene_duration(
         self,
         candidate_times: Iterable[float],
@@ -285,6 +1077,16 @@ class SceneDetector:
             merged[-1] = duration
         return merged
 
+    @staticmethod
+    def _get_workers(env_name: str, default: int) -> int:
+        value = os.getenv(env_name, str(default)).strip().lower()
+        if value == "auto":
+            return os.cpu_count() or 1
+        try:
+            return max(int(value), 0)
+        except ValueError:
+            return default
+
     @staticmethod
     def _get_float(env_name: str, default: float) -> float:
         try:
@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from services.media_probe import build_video_signature
+
+
+class SceneScoreCache:
+    """
+    按视频签名持久化每帧 scene 分数，供阈值调参直接复用，无需再次解码。
+    目录结构: <base_dir>/<signature>/{times.npy, scores.npy, meta.json}
+    读取时使用 mmap，长视频也只按需分页载入。
+    """
+
+    def __init__(self, base_dir: str = "scene_scores") -> None:
+        self.base_dir = Path(base_dir).resolve()
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    def load(self, signature: str) -> Optional[dict]:
+        """返回 {times, scores, duration, fps}，缓存缺失或损坏时返回 None。"""
+        entry_dir = self.base_dir / signature
+        meta_path = entry_dir / "meta.json"
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            times = np.load(entry_dir / "times.npy", mmap_mode="r")
+            scores = np.load(entry_dir / "scores.npy", mmap_mode="r")
+        except (OSError, ValueError, json.JSONDecodeError):
+            return None
+        if times.shape != scores.shape:
+            return None
+        return {
+            "times": times,
+            "scores": scores,
+            "duration": float(meta.get("duration") or 0.0),
+            "fps": float(meta.get("fps") or 24.0),
+        }
+
+    def save(
+        self,
+        signature: str,
+        times: np.ndarray,
+        scores: np.ndarray,
+        duration: float,
+        fps: float,
+    ) -> None:
+        entry_dir = self.base_dir / signature
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        self._write_array(entry_dir / "times.npy", np.asarray(times, dtype=np.float64))
+        self._write_array(entry_dir / "scores.npy", np.asarray(scores, dtype=np.float32))
+        # meta.json 最后写入，作为缓存完整可用的标记
+        meta = {"duration": duration, "fps": fps, "frames": int(len(times))}
+        tmp_path = entry_dir / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_path, entry_dir / "meta.json")
+
+    def has(self, signature: str) -> bool:
+        return (self.base_dir / signature / "meta.json").exists()
+
+    @staticmethod
+    def signature_for(video_path: str) -> str:
+        return build_video_signature(video_path)
+
+    @staticmethod
+    def _write_array(path: Path, array: np.ndarray) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
@@ -19,6 +19,8 @@ export function useFramePreview(): {
 } {
     const cacheRef = useRef<Map<string, string>>(new Map());
     const inflightRef = useRef<Set<string>>(new Set());
+    // 请求参数 -> 后端返回的 prev/current/next 帧时间（cacheRef 的 key），命中时不再请求
+    const tripletRef = useRef<Map<string, [string, string, string]>>(new Map());
     const latestRequestRef = useRef<number | null>(null);
 
     const sessionId = useTimelineStore((state) => state.sessionId);
@@ -37,18 +39,10 @@ export function useFramePreview(): {
         cacheRef.current.forEach((url) => URL.revokeObjectURL(url));
         cacheRef.current.clear();
         inflightRef.current.clear();
+        tripletRef.current.clear();
         setFramePreview({ url: null, isLoading: false, error: null, time: null });
     }, [sessionId, setFramePreview]);
 
-    const fetchFrameBlob = useCallback(
-        async (t: number) => {
-            const resp = await fetch(`${API_BASE}/api/frame/${sessionId}?time=${t}`);
-            if (!resp.ok) throw new Error(await resp.text());
-            return await resp.blob();
-        },
-        [sessionId]
-    );
-
     const requestFrame = useCallback(
         async (time: number) => {
             if (!sessionId) return;
@@ -113,46 +107,53 @@ export function useFramePreview(): {
     );
 
     const requestFrameTriplet = useCallback(
-        async (time: number, delta: number = 1 / 30) => {
+        async (time: number, delta?: number) => {
             if (!sessionId) return;
 
             const clampWithMargin = (t: number) => {
                 if (durationSeconds && durationSeconds > 0) {
-                    const margin = Math.max(delta, 0.02);
+                    const margin = Math.max(delta ?? 1 / 30, 0.02);
                     return Math.max(0, Math.min(t, durationSeconds - margin));
                 }
                 return Math.max(0, t);
             };
 
             const center = clampWithMargin(time);
-            const prev = clampWithMargin(center - delta);
-            const next = clampWithMargin(center + delta);
-
-            const keys = [center, prev, next].map((t) => t.toFixed(3));
             latestRequestRef.current = center;
+            const tripletKey = `${center.toFixed(3)}:${delta ?? ''}`;
+            const requestKey = `triplet:${tripletKey}`;
 
-            const getUrl = async (t: number, key: string) => {
-                if (cacheRef.current.has(key)) {
-                    return cacheRef.current.get(key) ?? null;
-                }
-                if (inflightRef.current.has(key)) return null;
-                inflightRef.current.add(key);
-                try {
-                    const blob = await fetchFrameBlob(t);
-                    const objectUrl = URL.createObjectURL(blob);
-                    cacheRef.current.set(key, objectUrl);
-                    if (cacheRef.current.size > CACHE_LIMIT) {
-                        const oldestKey = cacheRef.current.keys().next().value as string | undefined;
-                        if (oldestKey) {
-                            const url = cacheRef.current.get(oldestKey);
-                            if (url) URL.revokeObjectURL(url);
-                            cacheRef.current.delete(oldestKey);
-                        }
+            const cachedTriplet = tripletRef.current.get(tripletKey);
+            if (cachedTriplet && cachedTriplet.every((key) => cacheRef.current.has(key))) {
+                const [prevKey, centerKey, nextKey] = cachedTriplet;
+                setFramePreview({
+                    url: cacheRef.current.get(centerKey) ?? null,
+                    prevUrl: cacheRef.current.get(prevKey) ?? null,
+                    nextUrl: cacheRef.current.get(nextKey) ?? null,
+                    isLoading: false,
+                    error: null,
+                    time: Number(centerKey),
+                    prevTime: Number(prevKey),
+                    nextTime: Number(nextKey),
+                });
+                return;
+            }
+            if (inflightRef.current.has(requestKey)) return;
+
+            const cacheUrl = (key: string, blob: Blob) => {
+                const cached = cacheRef.current.get(key);
+                if (cached) return cached;
+                const objectUrl = URL.createObjectURL(blob);
+                cacheRef.current.set(key, objectUrl);
+                if (cacheRef.current.size > CACHE_LIMIT) {
+                    const oldestKey = cacheRef.current.keys().next().value as string | undefined;
+                    if (oldestKey) {
+                        const url = cacheRef.current.get(oldestKey);
+                        if (url) URL.revokeObjectURL(url);
+                        cacheRef.current.delete(oldestKey);
                     }
-                    return objectUrl;
-                } finally {
-                    inflightRef.current.delete(key);
                 }
+                return objectUrl;
             };
 
             setFramePreview({
@@ -162,31 +163,47 @@ export function useFramePreview(): {
                 isLoading: true,
                 error: null,
                 time: center,
-                prevTime: prev,
-                nextTime: next,
+                prevTime: previewFramePrevTime,
+                nextTime: previewFrameNextTime,
             });
 
+            inflightRef.current.add(requestKey);
             try {
-                const [centerUrl, prevUrl, nextUrl] = await Promise.all([
-                    getUrl(center, keys[0]),
-                    getUrl(prev, keys[1]),
-                    getUrl(next, keys[2]),
-                ]);
+                // 后端一次解码返回按帧网格对齐的 prev/current/next，part 名为实际帧时间
+                const params = new URLSearchParams({ time: String(center), radius: '1' });
+                if (delta != null) params.set('delta', String(delta));
+                const resp = await fetch(`${API_BASE}/api/frame/${sessionId}/neighborhood?${params}`);
+                if (!resp.ok) throw new Error(await resp.text());
+                const form = await resp.formData();
+                const frames = Array.from(form.entries())
+                    .filter((entry): entry is [string, File] => entry[1] instanceof Blob)
+                    .map(([key, blob]) => ({ key, time: Number(key), url: cacheUrl(key, blob) }));
+                if (frames.length === 0) throw new Error('empty frame neighborhood');
+
+                const centerIndex = frames.reduce(
+                    (best, frame, idx) =>
+                        Math.abs(frame.time - center) < Math.abs(frames[best].time - center) ? idx : best,
+                    0
+                );
+                const prevFrame = frames[Math.max(centerIndex - 1, 0)];
+                const centerFrame = frames[centerIndex];
+                const nextFrame = frames[Math.min(centerIndex + 1, frames.length - 1)];
+                tripletRef.current.set(tripletKey, [prevFrame.key, centerFrame.key, nextFrame.key]);
+                if (tripletRef.current.size > CACHE_LIMIT) {
+                    const oldestKey = tripletRef.current.keys().next().value as string | undefined;
+                    if (oldestKey) tripletRef.current.delete(oldestKey);
+                }
 
                 if (latestRequestRef.current === center) {
                     setFramePreview({
-                        url: centerUrl ?? previewFrameUrl,
-                        prevUrl: prevUrl ?? previewFramePrevUrl,
-                        nextUrl: nextUrl ?? previewFrameNextUrl,
+                        url: centerFrame.url,
+                        prevUrl: prevFrame.url,
+                        nextUrl: nextFrame.url,
                         isLoading: false,
                         error: null,
-                        time: center,
-                        prevTime: prev,
-                        nextTime: next,
-                    });
-                } else {
-                    [centerUrl, prevUrl, nextUrl].forEach((u) => {
-                        if (u && !cacheRef.current.has(u)) URL.revokeObjectURL(u);
+                        time: centerFrame.time,
+                        prevTime: prevFrame.time,
+                        nextTime: nextFrame.time,
                     });
                 }
             } catch (error) {
@@ -199,13 +216,27 @@ export function useFramePreview(): {
                         isLoading: false,
                         error: '帧图获取失败',
                         time: center,
-                        prevTime: prev,
-                        nextTime: next,
+                        prevTime: previewFramePrevTime,
+                        nextTime: previewFrameNextTime,
                     });
                 }
+            } finally {
+                inflightRef.current.delete(requestKey);
             }
         },
-        [cacheRef, inflightRef, previewFrameUrl, previewFramePrevUrl, previewFrameNextUrl, setFramePreview, durationSeconds, sessionId, fetchFrameBlob]
+        [
+            cacheRef,
+            inflightRef,
+            tripletRef,
+            previewFrameUrl,
+            previewFramePrevUrl,
+            previewFrameNextUrl,
+            previewFramePrevTime,
+            previewFrameNextTime,
+            setFramePreview,
+            durationSeconds,
+            sessionId,
+        ]
     );
 
     const clearFrame = useCallback(